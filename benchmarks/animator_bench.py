@@ -0,0 +1,74 @@
+from .common import measure
+from .common import print_header
+from .common import print_row
+from src.host import HostRuntime
+from os.path import join
+
+PONG_PATH = join("examples", "pong.py")
+
+class LegacyAnimationDone(Exception): ...
+
+class LegacyAnimator():
+    # Animator before the active lists: every animation is polled
+    # and the active one interrupts the frame by raising
+    _DONE = LegacyAnimationDone()
+
+    def __init__(self, engine):
+        self._engine = engine
+
+    def __enter__(self):
+        return self._run
+
+    def __exit__(self, exc_type, *_):
+        return exc_type is LegacyAnimationDone
+
+    def _run(self):
+        i = self._engine._loop.i
+        for animation in self._engine._animator._animations.values():
+            if animation._is_active:
+                if i % animation._stage_duration == 0:
+                    animation._on_stage_switch(
+                        i // animation._stage_duration % animation._n_stages
+                    )
+                raise self._DONE
+
+def legacy_render(renderer):
+    # Every layer composited, whatever it covers
+    pixels = map(renderer._choose_pixel, zip(*renderer._layers))
+    for i, pixel in enumerate(pixels):
+        renderer._neopixel[i] = pixel
+    renderer._neopixel.write()
+
+def legacy_frame(engine):
+    engine._loop._advance()
+    with LegacyAnimator(engine) as run_animations:
+        legacy_render(engine._renderer)
+        run_animations()
+
+def frame(engine):
+    engine._loop._advance()
+    engine._renderer.render()
+    engine._animator.run()
+
+def new_error_engine(runtime: HostRuntime):
+    engine, _ = runtime.new_engine(1)
+    runtime.step(engine)
+    engine._activate_error_animation()
+    return engine
+
+def run():
+    runtime = HostRuntime(PONG_PATH)
+    legacy_engine = new_error_engine(runtime)
+    engine = new_error_engine(runtime)
+    print_header("error state frame", "per frame")
+    print_row(
+        "raising animator, all layers",
+        measure(lambda: legacy_frame(legacy_engine), number=200)
+    )
+    print_row(
+        "active lists, coverage flags",
+        measure(lambda: frame(engine), number=200)
+    )
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,18 @@
+from timeit import Timer
+from typing import Callable
+
+ROW_FORMAT = "{:<40} {:>12}"
+
+def measure(func: Callable[[], object], number: int=1000, repeat: int=5):
+    best = min(Timer(func).repeat(repeat, number))
+    return best / number * 1e9
+
+def print_header(*columns: str):
+    print(ROW_FORMAT.format(*columns))
+    print("-" * len(ROW_FORMAT.format(*columns)))
+
+def print_row(label: str, ns: float):
+    print(ROW_FORMAT.format(label, f"{ns:,.0f} ns"))
+
+def print_size_row(label: str, n_bytes: int):
+    print(ROW_FORMAT.format(label, f"{n_bytes:,} B"))
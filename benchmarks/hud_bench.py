@@ -0,0 +1,66 @@
+from .common import measure
+from .common import print_header
+from .common import print_row
+from src.host import HostRuntime
+from src.host import HostReporter
+from os.path import join
+
+PONG_PATH = join("examples", "pong.py")
+MESSAGE = "GAME OVER - PLAYER 1 WINS!"
+
+def legacy_scroll(layer, font, x: int, y: int, color):
+    # Without the cache, every frame rebuilds the text from its glyphs
+    font._cache.clear()
+    layer.clear()
+    layer.write(MESSAGE, x, y, color)
+
+def new_engine(runtime: HostRuntime, font):
+    engine_cls = runtime.playduino.GameEngine._get_implementation(
+        runtime.game
+    )
+    hud_cls = type("HudGame", (engine_cls,), {"hud_font": font})
+    engine = hud_cls(HostReporter(), 1)
+    return engine
+
+def run():
+    runtime = HostRuntime(PONG_PATH)
+    playduino = runtime.playduino
+    font = playduino.FONT_3X5
+    white = playduino.PixelColors.WHITE
+    # Engines share the grid's class state, so they run one at a time
+    plain, _ = runtime.new_engine(1)
+    plain_ns = measure(lambda: runtime.step(plain), number=500)
+    engine = new_engine(runtime, font)
+    hud = engine.hud
+    positions = iter(range(10 ** 9))
+
+    print_header("HUD text", "per call")
+    print_row(
+        "glyphs to mask, uncached",
+        measure(lambda: (font._cache.clear(), font.render(MESSAGE)))
+    )
+    print_row("glyphs to mask, cached", measure(lambda: font.render(MESSAGE)))
+    print_row(
+        "marquee step, rebuilt text",
+        measure(lambda: legacy_scroll(
+            hud,
+            font,
+            16 - next(positions) % 120,
+            10,
+            white
+        ))
+    )
+    hud.clear()
+    hud.scroll(MESSAGE, y=10, period=1)
+    print_row("marquee step, offset blit", measure(hud._scroll))
+    print()
+    hud.write("07", 0, 0, playduino.PixelColors.YELLOW)
+    print_header("pong frame", "per frame")
+    print_row("no HUD", plain_ns)
+    print_row(
+        "scrolling marquee and score",
+        measure(lambda: runtime.step(engine), number=500)
+    )
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,53 @@
+from .common import ROW_FORMAT
+from .common import print_header
+from src.host import HostRuntime
+from time import perf_counter_ns
+from time import sleep
+from os.path import join
+
+TETRIS_PATH = join("examples", "tetris.py")
+N_FRAMES = 240
+INPUT_EVERY = 7
+
+def new_engine(runtime: HostRuntime, low_latency: bool):
+    engine_cls = runtime.playduino.GameEngine._get_implementation(
+        runtime.game
+    )
+    engine_cls.latency_probe = True
+    engine_cls.low_latency = low_latency
+    engine, _ = runtime.new_engine(1)
+    return engine
+
+def probe_frames(runtime: HostRuntime, engine):
+    # Inputs arrive right after a frame, the worst case for both orders
+    frame_ns = 1e9 / runtime.playduino.ScreenInfo.REFRESH_RATE
+    gamepads = runtime.playduino.GP_BUILDER._gamepads
+    for i in range(N_FRAMES):
+        start = perf_counter_ns()
+        runtime.step(engine)
+        if i % INPUT_EVERY == 0:
+            for gamepad in gamepads:
+                gamepad._push_state(i // INPUT_EVERY % 2)
+        sleep(max(frame_ns - (perf_counter_ns() - start), 0) / 1e9)
+    return engine._probe.summary()
+
+def print_latency(label: str, summary: dict):
+    for player in summary["players"]:
+        n_inputs = sum(player["counts"]) or 1
+        print(ROW_FORMAT.format(
+            f"{label}, {player['label']}",
+            f"{player['total_ms'] / n_inputs:.1f} ms"
+        ))
+
+def run():
+    print_header("input to strip write", "mean")
+    for label, low_latency in (
+        ("render first", False),
+        ("drain, simulate, draw, render", True)
+    ):
+        runtime = HostRuntime(TETRIS_PATH)
+        engine = new_engine(runtime, low_latency)
+        print_latency(label, probe_frames(runtime, engine))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,44 @@
+from .common import print_header
+from .common import print_row
+from src.host import HostRuntime
+from time import perf_counter_ns
+from time import sleep
+from os.path import join
+
+TETRIS_PATH = join("examples", "tetris.py")
+N_FRAMES = 120
+# What bitstream takes for 256 LEDs at 800 kHz
+WRITE_S = 0.008
+
+def sleeping_write(*_):
+    sleep(WRITE_S)
+
+def time_frames(runtime: HostRuntime, engine):
+    # Busy time per frame, with the loop sleeping out the rest
+    # of the frame like GameLoop does
+    frame_ns = 1e9 / runtime.playduino.ScreenInfo.REFRESH_RATE
+    total = 0
+    for _ in range(N_FRAMES):
+        start = perf_counter_ns()
+        runtime.step(engine)
+        elapsed = perf_counter_ns() - start
+        total += elapsed
+        sleep(max(frame_ns - elapsed, 0) / 1e9)
+    return total / N_FRAMES
+
+def run():
+    runtime = HostRuntime(TETRIS_PATH)
+    blocking_engine, _ = runtime.new_engine(1)
+    blocking_engine._renderer._neopixel.write = sleeping_write
+    threaded_engine, _ = runtime.new_engine(1)
+    threaded_engine._renderer._start_writer(sleeping_write)
+    print_header("frame with an 8 ms write", "per frame")
+    print_row("blocking write", time_frames(runtime, blocking_engine))
+    print_row(
+        "writer thread, swapped buffers",
+        time_frames(runtime, threaded_engine)
+    )
+    threaded_engine._renderer._stop_writer()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,106 @@
+from .common import measure
+from .common import print_header
+from .common import print_row
+from .common import print_size_row
+from src.host import HostRuntime
+from tracemalloc import start
+from tracemalloc import stop
+from tracemalloc import get_traced_memory
+from itertools import cycle
+from itertools import count
+
+N_COLORS = 7
+
+def allocated(new_object):
+    start()
+    obj = new_object()
+    size, _ = get_traced_memory()
+    stop()
+    return size, obj
+
+def legacy_fade(layer, base: list, colors: list, level: int):
+    # Tuple layers fade by rewriting every pixel with a scaled color
+    faded = {
+        color: tuple(channel * level // 255 for channel in color)
+        for color in colors
+    }
+    for row, base_row in zip(layer._matrix, base):
+        for x, color in enumerate(base_row):
+            row[x] = faded[color]
+
+def run():
+    playduino = HostRuntime().playduino
+    info = playduino.ScreenInfo
+    colors = [
+        playduino.PixelColors.RED,
+        playduino.PixelColors.GREEN,
+        playduino.PixelColors.BLUE,
+        playduino.PixelColors.YELLOW,
+        playduino.PixelColors.CYAN,
+        playduino.PixelColors.MAGENTA,
+        playduino.PixelColors.WHITE
+    ][:N_COLORS]
+    pattern = cycle(range(N_COLORS))
+    indexes = [
+        [next(pattern) for _ in range(info.WIDTH)]
+        for _ in range(info.HEIGHT)
+    ]
+
+    tuple_size, tuple_layer = allocated(playduino.ScreenLayer)
+    shared_size, palette = allocated(lambda: playduino.Palette(colors))
+    palette_size, palette_layer = allocated(
+        lambda: playduino.PaletteLayer(palette)
+    )
+    print_header("one full-screen layer", "allocated")
+    print_size_row("color tuples", tuple_size)
+    print_size_row("palette indexes", palette_size)
+    print_size_row("palette, shared by its layers", shared_size)
+    print()
+
+    tuple_renderer = playduino.ScreenRenderer()
+    tuple_renderer._layers.append(tuple_layer)
+    for y, row in enumerate(indexes):
+        for x, i in enumerate(row):
+            tuple_layer[x, y] = colors[i]
+    base = [list(row) for row in tuple_layer._matrix]
+    palette_renderer = playduino.ScreenRenderer()
+    palette_renderer._layers.append(palette_layer)
+    for y, row in enumerate(indexes):
+        for x, i in enumerate(row):
+            palette_layer[x, y] = i + 1
+
+    levels = count()
+    print_header("fade step and render", "per frame")
+    print_row(
+        "rewrite color tuples",
+        measure(
+            lambda: (
+                legacy_fade(tuple_layer, base, colors, next(levels) % 256),
+                tuple_renderer.render()
+            ),
+            number=200
+        )
+    )
+    print_row(
+        "edit palette",
+        measure(
+            lambda: (
+                palette.fade(next(levels) % 256),
+                palette_renderer.render()
+            ),
+            number=200
+        )
+    )
+    print()
+    print_header("render only", "per frame")
+    print_row(
+        "color tuples",
+        measure(tuple_renderer.render, number=200)
+    )
+    print_row(
+        "palette indexes",
+        measure(palette_renderer.render, number=200)
+    )
+
+if __name__ == "__main__":
+    run()
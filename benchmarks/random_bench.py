@@ -0,0 +1,95 @@
+from .common import measure
+from .common import print_header
+from .common import print_row
+from src.host import load_plain_module
+from random import Random
+from types import ModuleType
+import sys
+
+class LegacyRandom():
+    # The module at the baseline: Python wrappers over MicroPython's
+    # C urandom, stood in for here by CPython's C generator
+    _getrandbits32 = Random(1).getrandbits
+
+    @classmethod
+    def getrandbits(cls, bits: int) -> int:
+        n = bits // 32
+        d = 0
+        for i in range(n):
+            d |= cls._getrandbits32(32) << (i * 32)
+        r = bits % 32
+        if r >= 1:
+            d |= cls._getrandbits32(r) << (n * 32)
+        return d
+
+    @classmethod
+    def randrange(cls, start, stop=None):
+        if stop is None:
+            stop = start
+            start = 0
+        upper = stop - start
+        bits = 0
+        pwr2 = 1
+        while upper > pwr2:
+            pwr2 <<= 1
+            bits += 1
+        while True:
+            r = cls.getrandbits(bits)
+            if r < upper:
+                break
+        return r + start
+
+    @classmethod
+    def shuffle(cls, seq):
+        l = len(seq)
+        for i in range(l):
+            j = cls.randrange(l)
+            seq[i], seq[j] = seq[j], seq[i]
+
+def load_random():
+    # Over the same C generator as the baseline, so only the
+    # Python side of each module is compared
+    generator = Random(1)
+    urandom = ModuleType("urandom")
+    for name in (
+        "seed",
+        "getrandbits",
+        "randrange",
+        "randint",
+        "choice",
+        "random",
+        "uniform"
+    ):
+        setattr(urandom, name, getattr(generator, name))
+    saved = sys.modules.get("urandom")
+    sys.modules["urandom"] = urandom
+    try:
+        return load_plain_module("random")
+    finally:
+        if saved is None:
+            sys.modules.pop("urandom")
+        else:
+            sys.modules["urandom"] = saved
+
+def run():
+    random = load_random()
+    move_types = [0, 1]
+    blocks = list(range(16))
+    many_blocks = list(range(64))
+    cases = (
+        ("getrandbits(8)", lambda m: m.getrandbits(8)),
+        ("getrandbits(64)", lambda m: m.getrandbits(64)),
+        ("randrange(7)", lambda m: m.randrange(7)),
+        ("randrange(1000)", lambda m: m.randrange(1000)),
+        ("shuffle(2 move types)", lambda m: m.shuffle(move_types)),
+        ("shuffle(16 blocks)", lambda m: m.shuffle(blocks)),
+        ("shuffle(64 blocks)", lambda m: m.shuffle(many_blocks)),
+    )
+    for name, module in (("baseline", LegacyRandom), ("current", random)):
+        print_header(f"{name} random", "per call")
+        for label, case in cases:
+            print_row(label, measure(lambda: case(module)))
+        print()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,121 @@
+from .common import print_header
+from .common import print_row
+from src.host import HostRuntime
+from itertools import takewhile
+from itertools import dropwhile
+from itertools import chain
+from time import perf_counter_ns
+from os.path import join
+
+TETRIS_PATH = join("examples", "tetris.py")
+N_RUNS = 200
+
+def legacy_destroy_filled_rows(engine, playduino):
+    # Tetrominoe._destroy_filled_rows before the row API,
+    # clearing cell by cell and shifting through noclip_enabled
+    GameBlock = playduino.GameBlock
+    BlockMoves = playduino.BlockMoves
+
+    def is_hollow_row(row):
+        if not all(row):
+            nonlocal hollow_border
+            hollow_border += 1
+            shift_blocks.update(chain.from_iterable(row))
+            return True
+        return False
+
+    shift_blocks = set()
+    hollow_border = GameBlock.get_max_length()
+    n_filled_rows = 0
+    for n_filled_rows, filled_row in enumerate(
+        takewhile(
+            lambda r: all(r),
+            dropwhile(is_hollow_row, engine.grid)
+        ),
+        1
+    ):
+        for slot in filled_row:
+            engine.destroy_cell(slot)
+    if n_filled_rows:
+        def filter_coords(coord):
+            return coord[1] < hollow_border
+
+        shift_moves = tuple(
+            BlockMoves.SHIFT_DOWN
+            for _ in range(n_filled_rows)
+        )
+        with engine.noclip_enabled() as move:
+            for block in shift_blocks:
+                move(block, shift_moves, filter_coords)
+
+def shift_per_row(engine, playduino):
+    # The row API before collapse_rows, one region shift per row
+    rows = engine.full_rows()
+    engine.clear_rows(rows)
+    border = playduino.GameBlock.get_max_length()
+    for row in rows:
+        engine.shift_region(
+            (0, -border, playduino.ScreenInfo.WIDTH, row + border),
+            1
+        )
+
+def build_board(runtime: HostRuntime, n_rows: int):
+    game = runtime.game
+    engine, _ = runtime.new_engine(1)
+    engine._block_pool.flush()
+    for block in list(engine.spawned_blocks()):
+        engine.destroy_block(block, False)
+    engine._block_pool.flush()
+    bottom = 15
+    for y in range(bottom - n_rows + 1, bottom + 1):
+        for x in range(0, 16, 4):
+            engine.spawn(game.T1, (x, y))
+    # A loose stack above the filled rows, with pieces to shift
+    top = bottom - n_rows
+    for x, block_cls in zip(
+        range(0, 16, 4),
+        (game.T2, game.T3, game.T5, game.T6)
+    ):
+        engine.spawn(block_cls, (x, top - 1))
+    engine._block_pool.flush()
+    return engine
+
+def time_clear(runtime: HostRuntime, n_rows: int, clear):
+    total = 0
+    for _ in range(N_RUNS):
+        engine = build_board(runtime, n_rows)
+        with runtime.playduino.WallCorners._enable_cache():
+            start = perf_counter_ns()
+            clear(engine)
+            total += perf_counter_ns() - start
+    return total / N_RUNS
+
+def run():
+    runtime = HostRuntime(TETRIS_PATH)
+    playduino = runtime.playduino
+    destroy_filled_rows = runtime.game.Tetrominoe._destroy_filled_rows
+    print_header("clearing filled rows", "per clear")
+    for n_rows in (1, 2, 4):
+        print_row(
+            f"noclip, {n_rows} rows",
+            time_clear(
+                runtime,
+                n_rows,
+                lambda e: legacy_destroy_filled_rows(e, playduino)
+            )
+        )
+        print_row(
+            f"shift per row, {n_rows} rows",
+            time_clear(
+                runtime,
+                n_rows,
+                lambda e: shift_per_row(e, playduino)
+            )
+        )
+        print_row(
+            f"collapse_rows, {n_rows} rows",
+            time_clear(runtime, n_rows, destroy_filled_rows)
+        )
+
+if __name__ == "__main__":
+    run()
@@ -2,9 +2,9 @@ from playduino import (
     GameBlock,
     GameEngine,
     PixelColors,
-    WallCorners,
     SpawnDirectives,
     VerticalCorner,
+    HorizontalCorner,
     BlockMoves,
     BlockShift,
     ScreenInfo,
@@ -18,10 +18,13 @@ from random import choice
 class Platform(GameBlock):
     color = PixelColors.RED
     shape = [[1,1,1,1,1]]
+    max_instances = 2
 
 class Ball(GameBlock):
     color = PixelColors.BLUE
     shape = [[1]]
+    # The next ball spawns before the scored one is released
+    max_instances = 2
     _START_MOVES = (
         BlockMoves.SHIFT_UP_LEFT,
         BlockMoves.SHIFT_UP_RIGHT,
@@ -37,14 +40,15 @@ class Ball(GameBlock):
         self._shift *= shift
         self.move()   
 
-    def on_collision(self, other, engine: 'PongGame', move):
-        if isinstance(other, WallCorners):
-            if VerticalCorner in other:
-                engine.destroy_block(self)
-                engine.spawn_ball()
-            else:
-                self._apply_shift(BlockMoves.SHIFT_DOWN_LEFT)
-        elif (
+    def score(self, other, engine: 'PongGame', move):
+        engine.destroy_block(self)
+        engine.spawn_ball()
+
+    def bounce_off_wall(self, other, engine: 'PongGame', move):
+        self._apply_shift(BlockMoves.SHIFT_DOWN_LEFT)
+
+    def bounce_off_platform(self, other, engine: 'PongGame', move):
+        if (
             self.ref[0] < other.ref[0] or
             self.ref[0] >= other.ref[0] + other.width
         ):
@@ -52,6 +56,13 @@ class Ball(GameBlock):
         else:
             self._apply_shift(BlockMoves.SHIFT_UP_RIGHT)
 
+    # Scoring comes first, so hitting a corner still scores
+    on_collision_with = (
+        (VerticalCorner, score),
+        (HorizontalCorner, bounce_off_wall),
+        (Platform, bounce_off_platform)
+    )
+
     def move(self):
         super().move(self._shift)
 
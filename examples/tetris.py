@@ -7,59 +7,26 @@ from playduino import (
     BlockMoves,
     GPButtons,
     GPPeriodicCallback,
-    GridSlot,
+    ScreenInfo,
     GP_BUILDER
 )
-from itertools import takewhile
-from itertools import dropwhile
-from itertools import chain_from_iterable
 from random import choice
 from random import randint
 
 
 class Tetrominoe(GameBlock):
     cross_corners = [WallCorners.TOP]
+    # Landed pieces only move again when rows below them are cleared
+    sleep_after = ScreenInfo.REFRESH_RATE
 
     @staticmethod
     def _destroy_filled_rows(engine: 'TetrisGame'):
-        def is_hollow_row(row: tuple[GridSlot]):
-            if not all(row):
-                nonlocal hollow_border
-                hollow_border += 1
-                shift_blocks.update(chain_from_iterable(row))
-                return True
-            return False
-        
-        shift_blocks = set[GameBlock]()
-        hollow_border = GameBlock.get_max_length()
-        n_filled_rows = 0
-        for n_filled_rows, filled_row in enumerate(
-            takewhile(
-                lambda r: all(r),
-                dropwhile(is_hollow_row, engine.grid)
-            ),
-            1
-        ):
-            for slot in filled_row:
-                engine.destroy_cell(slot)
-        if n_filled_rows:
-            print(f"HOLLOWBORDER: {hollow_border}")
-            def filter_coords(coord: tuple[int, int]):
-                return coord[1] < hollow_border
-
-            shift_moves = tuple(
-                BlockMoves.SHIFT_DOWN
-                for _ in range(n_filled_rows)
-            )
-            with engine.noclip_enabled() as move:
-                for block in shift_blocks:
-                    move(block, shift_moves, filter_coords)
-
-    def on_collision(self, other, engine: 'TetrisGame', move):
-        if (
-            move is BlockMoves.SHIFT_DOWN and
-            (isinstance(other, GameBlock) or WallCorners.BOTTOM in other)
-        ):
+        rows = engine.full_rows()
+        engine.clear_rows(rows)
+        engine.collapse_rows(rows)
+
+    def land(self, other, engine: 'TetrisGame', move):
+        if move is BlockMoves.SHIFT_DOWN:
             if not self.is_fully_visible():
                 engine.destroy_block(self)
                 for block in engine.spawned_blocks():
@@ -69,6 +36,11 @@ class Tetrominoe(GameBlock):
                 self._destroy_filled_rows(engine)
             engine.spawn_falling()
 
+    on_collision_with = {
+        GameBlock: land,
+        WallCorners.BOTTOM: land
+    }
+
 class T1(Tetrominoe):
     color = PixelColors.CYAN
     shape = [[1,1,1,1]]
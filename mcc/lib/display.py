@@ -0,0 +1,72 @@
+from itertools import islice
+from typing import Any
+from typing import Sequence
+
+# Nothing here depends on the device, the host's sprite baker
+# imports this module as it is
+BLANK_CELLS = 0, " ", "."
+
+class FrameError(ValueError): ...
+
+class ScreenInfo():
+    WIDTH = HEIGHT = 16
+    REFRESH_RATE = 60
+
+class PixelColors:
+    RED = 255, 0, 0
+    GREEN = 0, 255, 0
+    BLUE = 0, 0, 255
+    CYAN = 0, 255, 255
+    MAGENTA = 255, 0, 255
+    YELLOW = 255, 255, 0
+    ORANGE = 255, 128, 0
+    PURPLE = 128, 0, 255
+    PINK = 255, 64, 192
+    LIGHT_BLUE = 64, 200, 255
+    LIME = 180, 255, 0
+    TEAL = 0, 180, 180
+    GRAY = 128, 128, 128
+    WHITE = 255, 255, 255
+    OFF = 0, 0, 0
+
+def _get_first_cell(row: Sequence):
+    for x, cell in enumerate(row):
+        if cell not in BLANK_CELLS:
+            return x
+    return -1
+
+def parse_frames(
+    frames: list[list[Sequence]],
+    cell_colors: dict[Any, tuple[int, int, int]]
+):
+    # Frames share one origin, so switching them doesn't shift the block
+    start_x = ScreenInfo.WIDTH
+    start_y = ScreenInfo.HEIGHT
+    for frame in frames:
+        for y, row in enumerate(frame):
+            x = _get_first_cell(row)
+            if x >= 0:
+                start_x = min(start_x, x)
+                start_y = min(start_y, y)
+    frame_offsets = []
+    frame_colors = []
+    for frame in frames:
+        offsets = []
+        colors = []
+        for y, row in enumerate(
+            islice(frame, start_y, start_y + ScreenInfo.HEIGHT)
+        ):
+            for x, cell in enumerate(
+                islice(row, start_x, ScreenInfo.WIDTH)
+            ):
+                if cell not in BLANK_CELLS:
+                    offsets.append((x, y))
+                    colors.append(cell_colors.get(cell))
+        if not offsets:
+            raise FrameError(
+                "There are no active "
+                "cells in block's shape"
+            )
+        frame_offsets.append(tuple(offsets))
+        frame_colors.append(any(colors) and tuple(colors) or None)
+    return tuple(frame_offsets), tuple(frame_colors)
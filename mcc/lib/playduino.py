@@ -1,20 +1,43 @@
 from machine import Pin
+from machine import RTC
+from machine import reset
+from machine import bitstream
 from neopixel import NeoPixel
 from report import ErrorReporter
+from display import ScreenInfo
+from display import PixelColors
+from display import FrameError
+from display import parse_frames
 from random import shuffle
 from random import randint
+from random import randrange
+from random import getrandbits
+from random import seed
+from _thread import start_new_thread
+from _thread import allocate_lock
 from asyncio import create_task
 from asyncio import Event
 from asyncio import sleep_ms
 from time import ticks_ms
+from time import ticks_us
+from time import ticks_diff
+from time import sleep
 from math import ceil
+from math import cos
+from math import sin
+from math import pi
 from itertools import dropwhile
-from itertools import islice
 from itertools import chain_from_iterable
 from itertools import cycle
 from operator import lt
 from operator import ge
 from contextlib import contextmanager
+from collections import OrderedDict
+from struct import pack_into
+from struct import calcsize
+from array import array
+from binascii import b2a_base64
+from os import urandom
 from typing import Iterable
 from typing import Optional
 from typing import Sequence
@@ -23,13 +46,14 @@ from typing import Callable
 from typing import Any
 from typing import Self
 
-from sys import maxsize
 import gc
 
 LED_PIN = 4
 
 class EngineError(RuntimeError): ...
 class SpawnError(EngineError): ...
+class FrameBudgetError(EngineError): ...
+class PoolGrowthError(EngineError): ...
 
 def init_class[C: type](cls: C):
     init: Callable[[], None] | None = getattr(cls, "__init_class__", None)
@@ -73,9 +97,76 @@ class BlockAngles():
 
 type OrtFilters = list[Callable[[Coord], Coord]]
 
+class PoolStats():
+    def __init__(self, name: str):
+        self.name = name
+        self.capacity = 0
+        self.size = 0
+        self.grown = 0
+        self.bytes = 0
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "capacity": self.capacity,
+            "size": self.size,
+            "grown": self.grown,
+            "bytes": self.bytes
+        }
+
+class PoolGuard():
+    def __init__(self, is_strict: bool):
+        self._is_strict = is_strict
+        self._is_sealed = False
+        self._stats: OrderedDict[str, PoolStats] = OrderedDict()
+
+    def _get_stats(self, name: str):
+        try:
+            return self._stats[name]
+        except KeyError:
+            stats = self._stats[name] = PoolStats(name)
+            return stats
+
+    def reserve(
+        self,
+        name: str,
+        items: list,
+        capacity: int,
+        new_item: Callable[[], Any]
+    ):
+        stats = self._get_stats(name)
+        stats.capacity = max(stats.capacity, capacity)
+        start = gc.mem_alloc()
+        while len(items) < capacity:
+            items.append(new_item())
+            stats.size += 1
+        stats.bytes += max(gc.mem_alloc() - start, 0)
+
+    def grow[T](self, name: str, new_item: Callable[[], T]) -> T:
+        stats = self._get_stats(name)
+        if self._is_sealed:
+            if self._is_strict:
+                raise PoolGrowthError(
+                    f"Pool {name} grew after the first frame "
+                    f"(capacity {stats.capacity}, size {stats.size})"
+                )
+            stats.grown += 1
+        start = gc.mem_alloc()
+        item = new_item()
+        stats.size += 1
+        stats.bytes += max(gc.mem_alloc() - start, 0)
+        return item
+
+    def seal(self):
+        self._is_sealed = True
+
+    def summary(self):
+        return [stats.to_dict() for stats in self._stats.values()]
+
 class Cached():
     _cache: dict[type['Cached'], list[Self]] = {}
     _cache_i: int
+    _guard: Optional[PoolGuard] = None
 
     @classmethod
     def new_empty(cls):
@@ -95,10 +186,18 @@ class Cached():
         try:
             return cache[cls._cache_i]
         except IndexError:
-            pos = cls.new_empty()
+            if cls._guard:
+                pos = cls._guard.grow(cls.__name__, cls.new_empty)
+            else:
+                pos = cls.new_empty()
             cache.append(pos)
             return pos
 
+    @classmethod
+    def _reserve(cls, guard: PoolGuard, capacity: int):
+        cls._guard = guard
+        guard.reserve(cls.__name__, cls._get_cache(), capacity, cls.new_empty)
+
     @classmethod
     @contextmanager
     def _enable_cache(cls):
@@ -125,26 +224,73 @@ class BlockPos(Copyable, Cached):
 
     def __init__(
         self,
-        ref: Coord,
+        ref: int,
         offs: tuple[Coord],
-        ort_i: int
+        cells: tuple[tuple[int]],
+        ort_i: int,
+        colors: Optional[tuple]=None
     ):
         self.offs = offs
+        self.cells = cells
         self.ref = ref
         self.ort_i = ort_i
+        # Per-cell colors, in the same order as the offsets
+        self.colors = colors
+
+    @classmethod
+    def get_cells(cls, offs: tuple[Coord]):
+        return tuple(
+            tuple(GridGeometry.pack_offset(ort_filter(off)) for off in offs)
+            for ort_filter in cls._ORT_FILTERS
+        )
 
     def __iter__(self):
-        ort_filter = self._ORT_FILTERS[self.ort_i % 4]
-        for off in self.offs:
-            yield COPS.add(self.ref, ort_filter(off))
+        ref = self.ref
+        for cell in self.cells[self.ort_i % 4]:
+            yield ref + cell
 
-    def to_offset(self, coord: Coord):
+    def to_offset(self, coord: int):
         ort_filter = self._ORT_REVERSE_FILTERS[self.ort_i % 4]
-        return ort_filter(COPS.sub(coord, self.ref))
+        return ort_filter(GridGeometry.unpack_offset(coord - self.ref))
 
-    def remove(self, coord: Coord):
-        off = self.to_offset(coord)
-        self.offs = tuple(off_ for off_ in self.offs if off_ != off)
+    def set_offsets(self, offs: tuple[Coord]):
+        self.offs = offs
+        self.cells = self.get_cells(offs)
+
+    def remove(self, coord: int):
+        i = self.cells[self.ort_i % 4].index(coord - self.ref)
+        self.set_offsets(self.offs[:i] + self.offs[i + 1:])
+        if self.colors:
+            self.colors = self.colors[:i] + self.colors[i + 1:]
+
+    def remove_all(self, coords: list[int]):
+        ref = self.ref
+        cells = self.cells[self.ort_i % 4]
+        if self.colors:
+            self.colors = tuple(
+                color
+                for color, cell in zip(self.colors, cells)
+                if ref + cell not in coords
+            )
+        self.set_offsets(tuple(
+            off
+            for off, cell in zip(self.offs, cells)
+            if ref + cell not in coords
+        ))
+
+    def shift_cells(self, coords: list[int], delta: int):
+        ort_i = self.ort_i % 4
+        if len(coords) < len(self.offs):
+            # Cells left behind keep their place around the shifted ref
+            reverse_filter = self._ORT_REVERSE_FILTERS[ort_i]
+            ref = self.ref
+            self.set_offsets(tuple(
+                off
+                if ref + cell in coords else
+                reverse_filter(GridGeometry.unpack_offset(cell - delta))
+                for off, cell in zip(self.offs, self.cells[ort_i])
+            ))
+        self.ref += delta
 
     def has_cells(self):
         return bool(self.offs)
@@ -167,21 +313,39 @@ class MissingMoveError(Exception): ...
 class BlockShift(BlockMove):
     _i = 0
     _ORIGIN = 0, 0
+    # GridGeometry.configure recomputes every delta when the stride
+    # changes, products are shared so bounces don't add to the list
+    _stride = 0
+    _shifts: list['BlockShift'] = []
+    _products: dict[Coord, 'BlockShift'] = {}
 
     def __init__(self, shift: Coord):
         self._shift = shift
+        self._delta = shift[1] * self._stride + shift[0]
+        self._shifts.append(self)
 
     def __mul__(self, other: 'BlockShift'):
-        return BlockShift(COPS.mul(self._shift, other._shift))
-        
+        shift = COPS.mul(self._shift, other._shift)
+        try:
+            return self._products[shift]
+        except KeyError:
+            product = self._products[shift] = BlockShift(shift)
+            return product
+
+    @classmethod
+    def _set_stride(cls, stride: int):
+        cls._stride = stride
+        for shift in cls._shifts:
+            shift._delta = shift._shift[1] * stride + shift._shift[0]
+
     def _apply(self, pos):
-        pos.ref = COPS.add(pos.ref, self._shift)
+        pos.ref += self._delta
 
-    def _simulate(self, coord: Coord):
-        return COPS.add(self._shift, coord)
+    def _simulate(self, coord: int):
+        return coord + self._delta
 
     def _revert(self, pos):
-        pos.ref = COPS.sub(pos.ref, self._shift)
+        pos.ref -= self._delta
 
     def _is_opposite(self, other: 'BlockShift'):
         return COPS.add(self._shift, other._shift) == self._ORIGIN
@@ -265,13 +429,130 @@ class BlockMoves():
     ROTATE_CW = BlockRotate(1)
     ROTATE_CCW = BlockRotate(-1)
 
-class ScreenInfo():
-    WIDTH = HEIGHT = 16
-    REFRESH_RATE = 60
+@init_class
+class GridGeometry():
+    BORDER: int
+    MARGIN: int
+    STRIDE: int
+    N_ROWS: int
+    SIZE: int
+    _OPS = lt, ge
+    _bounds_masks: dict[tuple[int, int, int, int], bytearray] = {}
+
+    @classmethod
+    def __init_class__(cls):
+        cls.configure(0)
+
+    @classmethod
+    def configure(cls, border: int):
+        cls.BORDER = border
+        # A rotation or shift can take a cell this far past the outer
+        # bounding, and it must not wrap around into another row
+        cls.MARGIN = 2 * border + 1
+        padding = 2 * (border + cls.MARGIN)
+        cls.STRIDE = ScreenInfo.WIDTH + padding
+        cls.N_ROWS = ScreenInfo.HEIGHT + padding
+        cls.SIZE = cls.STRIDE * cls.N_ROWS
+        cls._bounds_masks = {}
+        BlockShift._set_stride(cls.STRIDE)
+
+    @classmethod
+    def pack(cls, coord: Coord):
+        return (coord[1] + cls.MARGIN) * cls.STRIDE + coord[0] + cls.MARGIN
+
+    @classmethod
+    def unpack(cls, coord: int):
+        y, x = divmod(coord, cls.STRIDE)
+        return x - cls.MARGIN, y - cls.MARGIN
+
+    @classmethod
+    def pack_offset(cls, offset: Coord):
+        return offset[1] * cls.STRIDE + offset[0]
+
+    @classmethod
+    def unpack_offset(cls, offset: int):
+        dy = (offset + cls.STRIDE // 2) // cls.STRIDE
+        return offset - dy * cls.STRIDE, dy
+
+    @classmethod
+    def from_screen(cls, coord: Coord):
+        return cls.pack((coord[0] + cls.BORDER, coord[1] + cls.BORDER))
+
+    @classmethod
+    def to_screen_index(cls, coord: int):
+        y, x = divmod(coord, cls.STRIDE)
+        x -= cls.MARGIN + cls.BORDER
+        y -= cls.MARGIN + cls.BORDER
+        if 0 <= x < ScreenInfo.WIDTH and 0 <= y < ScreenInfo.HEIGHT:
+            return y * ScreenInfo.WIDTH + x
+        return -1
+
+    @classmethod
+    def get_region(cls, rect: tuple[int, int, int, int]):
+        x, y, width, height = rect
+        start = cls.from_screen((x, y))
+        col_start = start % cls.STRIDE
+        region_start = start - col_start
+        return (
+            region_start,
+            region_start + height * cls.STRIDE,
+            col_start,
+            col_start + width
+        )
+
+    @classmethod
+    def clip(cls, rect: tuple[int, int, int, int]):
+        x, y, width, height = rect
+        x_start, y_start = max(x, 0), max(y, 0)
+        x_end = min(x + width, ScreenInfo.WIDTH)
+        y_end = min(y + height, ScreenInfo.HEIGHT)
+        if x_start >= x_end or y_start >= y_end:
+            return None
+        return x_start, y_start, x_end - x_start, y_end - y_start
+
+    @classmethod
+    def is_visible(cls, coord: int):
+        return cls.to_screen_index(coord) >= 0
+
+    @classmethod
+    def get_bounds_mask(cls, boundings: tuple[int, int, int, int]):
+        try:
+            return cls._bounds_masks[boundings]
+        except KeyError:
+            pass
+        lines = [
+            bytes(
+                sum(
+                    1 << i
+                    for i in range(axis, 4, 2)
+                    if cls._OPS[i // 2](c - cls.MARGIN, boundings[i])
+                )
+                for c in range(size)
+            )
+            for axis, size in enumerate((cls.STRIDE, cls.N_ROWS))
+        ]
+        x_bits, y_bits = lines
+        mask = bytearray(cls.SIZE)
+        for y in range(cls.N_ROWS):
+            row_bits = y_bits[y]
+            start = y * cls.STRIDE
+            for x in range(cls.STRIDE):
+                mask[start + x] = x_bits[x] | row_bits
+        cls._bounds_masks[boundings] = mask
+        return mask
+
+class WallCorner():
+    # Bits follow BOUNDING_CORNERS, as in the grid bounds masks
+    _mask = 0b1111
 
-class WallCorner(): ...
-class VerticalCorner(WallCorner): ...
-class HorizontalCorner(WallCorner): ...
+    def __init__(self, mask: int):
+        self._mask = mask
+
+class VerticalCorner(WallCorner):
+    _mask = 0b1010
+
+class HorizontalCorner(WallCorner):
+    _mask = 0b0101
 
 def add(a: int, b: int):
     return a + b
@@ -282,21 +563,20 @@ def sub(a: int, b: int):
 class WallCorners(Cached):
     _cache_i = -1
 
-    TOP = VerticalCorner()
-    BOTTOM = VerticalCorner()
-    LEFT = HorizontalCorner()
-    RIGHT = HorizontalCorner()
+    LEFT = HorizontalCorner(0b0001)
+    TOP = VerticalCorner(0b0010)
+    RIGHT = HorizontalCorner(0b0100)
+    BOTTOM = VerticalCorner(0b1000)
 
     def __init__(self, corners: list[WallCorner]):
         self._corners = corners
+        mask = 0
+        for corner in corners:
+            mask |= corner._mask
+        self._mask = mask
 
     def __contains__(self, corner: type[WallCorner] | WallCorner):
-        if not type(corner) is type:
-            return corner in self._corners
-        return any(
-            isinstance(corner_, corner)
-            for corner_ in self._corners
-        )
+        return bool(self._mask & corner._mask)
     
     def __iter__(self):
         return iter(self._corners)
@@ -311,54 +591,50 @@ BOUNDING_CORNERS = (
 class GameBlock():
     color: tuple[int, int, int] = 255, 255, 255
     shape: Optional[list[list[int]]] = None
+    frames: Optional[list[list[Sequence]]] = None
+    cell_colors: dict[Any, tuple[int, int, int]] = {}
     cross_corners: list[WallCorner] = []
+    max_instances: int = 0
+    sleep_after: int = 0
+    on_collision_with: (
+        dict[Any, Callable] | tuple[tuple[Any, Callable], ...]
+    ) = {}
     _MME = MissingMoveError()
     _max_length = 0
+    _class_i = 0
+    _grid: Optional['GameGrid'] = None
 
     @classmethod
     def _process(cls):
-        def is_empty_row(row: list[int]):
-            return not any(row)
-        
-        def get_offsets():
-            start_x = min(
-                next(
-                    (x for x, cell in enumerate(row) if cell),
-                    ScreenInfo.WIDTH
-                )
-                for row in cls.shape
-            )
-            offsets = tuple(
-                (x, y)
-                for y, row in enumerate(
-                    islice(
-                        dropwhile(
-                            is_empty_row,
-                            cls.shape
-                        ),
-                        ScreenInfo.HEIGHT
-                    )
-                )
-                for x, cell in enumerate(
-                    islice(row, start_x, ScreenInfo.WIDTH)
-                )
-                if cell
-            )
-            if not offsets:
-                raise EngineError(
-                    "There are no active "
-                    "cells in block's shape"
+        # Baked by the host compiler, there's nothing left to parse
+        baked = cls.__dict__.get("_baked")
+        if baked:
+            cls._frame_offsets, cls._frame_colors = baked
+        elif cls.frames or cls.shape:
+            try:
+                cls._frame_offsets, cls._frame_colors = parse_frames(
+                    cls.frames or [cls.shape],
+                    cls.cell_colors
                 )
-            return offsets
-        
-        if not cls.shape:
+            except FrameError as e:
+                raise EngineError(e.args[0])
+        else:
             raise EngineError(
-                "You must define shape "
-                "by overloading the class variable"
+                "You must define shape or frames "
+                "by overloading the class variables"
             )
-        cls._offsets = get_offsets()
-        cls._width = max(coord[0] for coord in cls._offsets) + 1
-        cls._height = max(coord[1] for coord in cls._offsets) + 1
+        cls._offsets = cls._frame_offsets[0]
+        cls._colors = cls._frame_colors[0]
+        cls._width = max(
+            x
+            for offsets in cls._frame_offsets
+            for x, _ in offsets
+        ) + 1
+        cls._height = max(
+            y
+            for offsets in cls._frame_offsets
+            for _, y in offsets
+        ) + 1
         GameBlock._max_length = max(
             GameBlock._max_length,
             cls._width,
@@ -383,23 +659,86 @@ class GameBlock():
 
         bases = ScreenInfo.WIDTH, ScreenInfo.HEIGHT
         cls._boundings = tuple(get_boundings())
+        cls._bounds_mask = GridGeometry.get_bounds_mask(cls._boundings)
+        cls._frame_cells = tuple(
+            BlockPos.get_cells(offsets)
+            for offsets in cls._frame_offsets
+        )
+        cls._cells = cls._frame_cells[0]
+        # Pools index blocks under every block class they derive from,
+        # GameBlock included, so it stands for any block
+        lineage = [cls]
+        for klass in lineage:
+            for base in klass.__bases__:
+                if issubclass(base, GameBlock) and base not in lineage:
+                    lineage.append(base)
+        cls._lineage = tuple(lineage)
 
-    def is_fully_visible(self):
-        max_length = self._max_length
-        dimensions = ScreenInfo.WIDTH, ScreenInfo.HEIGHT
-        return all(
-            c >= max_length and c < dim + max_length
-            for coord in self._pos
-            for c, dim in zip(coord, dimensions)
+    @classmethod
+    def _resolve_collisions(cls, block_classes: Iterable[type['GameBlock']]):
+        def get_lineage(klass: type):
+            yield klass
+            for base in klass.__bases__:
+                yield from get_lineage(base)
+
+        def is_wall_key(key: Any):
+            return isinstance(key, WallCorner) or (
+                isinstance(key, type) and issubclass(key, WallCorner)
+            )
+
+        def find_handler(keys: Iterable[Any]):
+            for key in keys:
+                if key in handlers:
+                    return handlers[key]
+            return cls.on_collision
+
+        def find_wall_handler(mask: int):
+            # A hit can span several corners, so the first wall key
+            # declared that covers any of them wins
+            for key, handler in pairs:
+                if key is WallCorners or is_wall_key(key) and key._mask & mask:
+                    return handler
+            return cls.on_collision
+
+        handlers = cls.on_collision_with
+        # Pairs keep their order on the device, where dicts don't
+        pairs = (
+            tuple(handlers.items())
+            if isinstance(handlers, dict) else
+            tuple(handlers)
+        )
+        handlers = dict(pairs)
+        cls._block_handlers = {
+            block_cls: find_handler(get_lineage(block_cls))
+            for block_cls in block_classes
+        }
+        cls._wall_handlers = tuple(
+            find_wall_handler(mask)
+            for mask in range(1 << len(BOUNDING_CORNERS))
         )
 
+    def is_fully_visible(self):
+        return all(GridGeometry.is_visible(coord) for coord in self._pos)
+
     def __init__(self):
         self._pos = BlockPos.new_empty()
         self._move_slots: list[BlockMove | None] = [None, None]
+        self._pool: Optional['BlockPool'] = None
+        self._pool_i = -1
+        self._members_at: dict[type[GameBlock], int] = {}
+        self._active_i = -1
+        self._is_deleted = False
+        self._is_sleeping = False
+        self._idle_frames = 0
+        self._frame_i = 0
 
     def _abort_move(self, move_type: type[BlockMove]):
         self._move_slots[move_type._i] = None
 
+    def _abort_moves(self):
+        for i in range(len(self._move_slots)):
+            self._move_slots[i] = None
+
     def _wants_to_move(self, move_type: type[BlockMove]):
         return bool(self._move_slots[move_type._i])
 
@@ -411,6 +750,36 @@ class GameBlock():
         
     def move(self, block_move: BlockMove):
         self._move_slots[block_move._i] = block_move
+        self._idle_frames = 0
+        if self._is_sleeping:
+            self._pool.wake(self)
+
+    def sleep(self):
+        self._pool.sleep(self)
+
+    def wake(self):
+        self._idle_frames = 0
+        if self._is_sleeping:
+            self._pool.wake(self)
+
+    @property
+    def is_sleeping(self):
+        return self._is_sleeping
+
+    @property
+    def frame(self):
+        return self._frame_i
+
+    @property
+    def n_frames(self):
+        return len(self._frame_offsets)
+
+    def set_frame(self, i: int):
+        # Only a placed block has cells to rewrite, a destroyed one
+        # would leave them behind until the next clear
+        if self._is_deleted or not self._pool:
+            return False
+        return self._grid._set_frame(self, i % len(self._frame_offsets))
 
     def on_spawn(self): ...
 
@@ -426,7 +795,7 @@ class GameBlock():
 
     @property
     def ref(self):
-        return self._pos.ref
+        return GridGeometry.unpack(self._pos.ref)
     
     @property
     def width(self):
@@ -503,30 +872,56 @@ class MissingBlockError(EngineError): ...
 
 class GridSlot():
     _MBE = MissingBlockError()
+    # Shared with the grid, which sizes it over the packed coordinates
+    _occupancy = bytearray()
+    _fields: list['DistanceField | PlaceMask'] = []
+    # Counts every slot edit, so a frame that changed nothing is known
+    _n_changes = 0
 
-    def __init__(self, coord: Coord):
+    def __init__(self, coord: int):
         self._coord = coord
         self._slot: list[GameBlock] = []
 
     def __iter__(self):
         return iter(self._slot)
 
+    def _touch(self, block: GameBlock | None):
+        for field in self._fields:
+            field._touch(self._coord, block)
+
     def clear(self):
-        self._slot.clear()
+        if self._slot:
+            GridSlot._n_changes += 1
+            self._slot.clear()
+            self._occupancy[self._coord] = 0
+            self._touch(None)
 
     def remove(self, block: GameBlock):
         try:
-            return self._slot.remove(block)
+            self._slot.remove(block)
         except ValueError:
             raise self._MBE
+        GridSlot._n_changes += 1
+        self._occupancy[self._coord] -= 1
+        if not self._slot:
+            self._touch(block)
         
     def add(self, block: GameBlock):
         self._slot.append(block)
+        GridSlot._n_changes += 1
+        self._occupancy[self._coord] += 1
+        if len(self._slot) == 1:
+            self._touch(block)
     
     def flush(self):
         try:
             while True:
-                yield self._slot.pop()
+                block = self._slot.pop()
+                GridSlot._n_changes += 1
+                self._occupancy[self._coord] -= 1
+                if not self._slot:
+                    self._touch(block)
+                yield block
         except IndexError:
             pass
     
@@ -549,23 +944,6 @@ class GridSlot():
     
 class RevertedBlockError(Exception): ...
 
-class PixelColors:
-    RED = 255, 0, 0  
-    GREEN = 0, 255, 0   
-    BLUE = 0, 0, 255 
-    CYAN = 0, 255, 255 
-    MAGENTA = 255, 0, 255
-    YELLOW = 255, 255, 0   
-    ORANGE = 255, 128, 0 
-    PURPLE = 128, 0, 255 
-    PINK = 255, 64, 192
-    LIGHT_BLUE = 64, 200, 255
-    LIME = 180, 255, 0
-    TEAL = 0, 180, 180
-    GRAY = 128, 128, 128
-    OFF = 0, 0, 0
-
-
 class GameLoop():
     def __init__(self):
         self._i: int = 0
@@ -581,6 +959,9 @@ class GameLoop():
     def stop(self):
         self._is_stopping = True
 
+    def _advance(self):
+        self._i += 1
+
     def __aiter__(self):
         return self
     
@@ -591,13 +972,143 @@ class GameLoop():
         sleep_duration = max(self._sleep_ms - sleep_discount, 0)
         await sleep_ms(sleep_duration)
         self._last_iter_ms = ticks_ms()
-        self._i += 1
+        self._advance()
         if self._i % self._delta_collect == 0:
             # gc.collect()
             print(gc.mem_free())
 
+class Timer():
+    def __init__(self, callback: Callable[[], Any], period: int=0):
+        self._callback = callback
+        self._period = period
+        self._due = -1
+        self._slot: Optional[list[Timer]] = None
+        self._wheel: Optional[TimerWheel] = None
+
+    @property
+    def is_scheduled(self):
+        return self._due >= 0
+
+    def cancel(self):
+        if self._slot is not None:
+            self._slot.remove(self)
+            self._slot = None
+            self._wheel._n_timers -= 1
+        self._due = -1
+
+class TimerWheel():
+    def __init__(self, n_slots: int=64):
+        # Slots are picked by masking the due tick
+        self._mask = n_slots - 1
+        self._slots = tuple([] for _ in range(n_slots))
+        self._due: list[Timer] = []
+        self._tick = 0
+        self._n_timers = 0
+        self._peak = 0
+        self._fired = 0
+        self._visited = 0
+
+    @property
+    def tick(self):
+        return self._tick
+
+    def start(self, timer: Timer, delay: int):
+        timer.cancel()
+        # The current tick was already advanced, so it can't be due anymore
+        self._schedule(timer, self._tick + max(delay, 1))
+        return timer
+
+    def every(
+        self,
+        period: int,
+        callback: Callable[[], Any],
+        delay: Optional[int]=None
+    ):
+        if period < 1:
+            raise EngineError("A timer period must be at least one frame")
+        return self.start(
+            Timer(callback, period),
+            period if delay is None else delay
+        )
+
+    def after(self, delay: int, callback: Callable[[], Any]):
+        return self.start(Timer(callback), delay)
+
+    def _schedule(self, timer: Timer, due: int):
+        slot = self._slots[due & self._mask]
+        slot.append(timer)
+        timer._slot = slot
+        timer._wheel = self
+        timer._due = due
+        self._n_timers += 1
+        if self._n_timers > self._peak:
+            self._peak = self._n_timers
+
+    def _is_due(self):
+        # Whether the next tick fires any timer
+        tick = self._tick + 1
+        for timer in self._slots[tick & self._mask]:
+            if timer._due == tick:
+                return True
+        return False
+
+    def _advance(self):
+        self._tick += 1
+        now = self._tick
+        slot = self._slots[now & self._mask]
+        if not slot:
+            return
+        self._visited += len(slot)
+        due = self._due
+        kept = 0
+        for timer in slot:
+            if timer._due == now:
+                timer._slot = None
+                due.append(timer)
+            else:
+                slot[kept] = timer
+                kept += 1
+        del slot[kept:]
+        self._n_timers -= len(due)
+        try:
+            for timer in due:
+                # Cancelled by a callback fired before it
+                if timer._due != now:
+                    continue
+                if timer._period:
+                    self._schedule(timer, now + timer._period)
+                else:
+                    timer._due = -1
+                self._fired += 1
+                timer._callback()
+        finally:
+            due.clear()
+
+    def summary(self):
+        return {
+            "slots": len(self._slots),
+            "timers": self._n_timers,
+            "peak": self._peak,
+            "busiest": max(len(slot) for slot in self._slots),
+            "ticks": self._tick,
+            "fired": self._fired,
+            "visited": self._visited
+        }
+
 class ScreenLayer(Matrix[tuple[int, int, int] | None]):
+    EMPTY, PARTIAL, OPAQUE = range(3)
     _row_filters = iter, reversed
+
+    def __init__(self):
+        super().__init__()
+        self._coverage = self.EMPTY
+
+    def _cover(self, pixel: tuple[int, int, int] | None):
+        if pixel is None:
+            if self._coverage == self.OPAQUE:
+                self._coverage = self.PARTIAL
+        elif self._coverage == self.EMPTY:
+            self._coverage = self.PARTIAL
     
     def __setitem__(
         self,
@@ -605,16 +1116,31 @@ class ScreenLayer(Matrix[tuple[int, int, int] | None]):
         pixel: tuple[int, int, int] | None
     ):
         self._matrix[coord[1]][coord[0]] = pixel
+        self._cover(pixel)
+
+    def set_at(self, index: int, pixel: tuple[int, int, int] | None):
+        self._matrix[index // ScreenInfo.WIDTH][index % ScreenInfo.WIDTH] = pixel
+        self._cover(pixel)
+
+    def get_row(self, index: int):
+        # Whatever gets written to the row is unknown from here
+        self._coverage = self.PARTIAL
+        return self._matrix[index]
 
     @staticmethod
     def _clear_row(row):
         for i in range(len(row)):
             row[i] = None
 
+    def clear(self):
+        super().clear()
+        self._coverage = self.EMPTY
+
     def fill_with(self, pixel: tuple[int, int, int]):
         for row in self._matrix:
             for i in range(len(row)):
                 row[i] = pixel
+        self._coverage = self.OPAQUE
     
     def __iter__(self):
         for row, row_filter in zip(
@@ -623,19 +1149,538 @@ class ScreenLayer(Matrix[tuple[int, int, int] | None]):
         ):
             yield from row_filter(row)
 
+class Palette():
+    TRANSPARENT = 0
+    MAX_COLORS = 256
+
+    def __init__(self, colors: Iterable[tuple[int, int, int]]=()):
+        # Entries grow with the colors added, the first one is off
+        self._base: list[tuple[int, int, int] | None] = [None]
+        self._colors: list[tuple[int, int, int] | None] = [None]
+        self._indexes: dict[tuple[int, int, int], int] = {}
+        # Already in the strip's byte order, and sized for any index a
+        # layer can hold so unused ones render off
+        self._bytes = bytearray(3 * self.MAX_COLORS)
+        self._n = 1
+        self._level = 255
+        for color in colors:
+            self.add(color)
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, index: int):
+        if 0 <= index < self._n:
+            return self._colors[index]
+        return None
+
+    def __setitem__(self, index: int, color: tuple[int, int, int]):
+        # Pixels keep their index, recoloring an entry recolors them all
+        if not 0 < index < self._n:
+            raise EngineError(f"There's no palette entry {index} to replace")
+        self._base[index] = color
+        self._apply(index)
+
+    def add(self, color: tuple[int, int, int]):
+        try:
+            return self._indexes[color]
+        except KeyError:
+            pass
+        index = self._n
+        if index == self.MAX_COLORS:
+            raise EngineError("The palette is full")
+        self._n += 1
+        self._indexes[color] = index
+        self._base.append(None)
+        self._colors.append(None)
+        self[index] = color
+        return index
+
+    def index_of(self, color: tuple[int, int, int]) -> Optional[int]:
+        return self._indexes.get(color)
+
+    def _apply(self, index: int):
+        color = self._base[index]
+        level = self._level
+        if level != 255:
+            color = tuple(channel * level // 255 for channel in color)
+        self._colors[index] = color
+        offset = 3 * index
+        for channel, position in zip(color, NeoPixel.ORDER):
+            self._bytes[offset + position] = channel
+
+    def fade(self, level: int):
+        # 0 turns every entry off and 255 restores them
+        self._level = max(0, min(level, 255))
+        for index in range(1, self._n):
+            self._apply(index)
+
+    def cycle(self, start: int=1, stop: int | None=None, step: int=1):
+        if stop is None:
+            stop = self._n
+        base = self._base
+        colors = base[start:stop]
+        n_colors = len(colors)
+        for i in range(n_colors):
+            base[start + i] = colors[(i + step) % n_colors]
+            self._apply(start + i)
+
+@init_class
+class PaletteLayer(ScreenLayer):
+    # One palette index per pixel instead of a color tuple
+
+    @classmethod
+    def __init_class__(cls):
+        # Pixel indexes in the order the strip is wired
+        width = ScreenInfo.WIDTH
+        cls._WIRING = tuple(
+            range(y * width + width - 1, y * width - 1, -1)
+            if y % 2 else
+            range(y * width, y * width + width)
+            for y in range(ScreenInfo.HEIGHT)
+        )
+
+    def __init__(self, palette: Palette):
+        self._palette = palette
+        self._pixels = bytearray(ScreenInfo.WIDTH * ScreenInfo.HEIGHT)
+        self._blank = bytes(len(self._pixels))
+        self._coverage = self.EMPTY
+
+    @property
+    def palette(self):
+        return self._palette
+
+    def _cover(self, index: int):
+        if not index:
+            if self._coverage == self.OPAQUE:
+                self._coverage = self.PARTIAL
+        elif self._coverage == self.EMPTY:
+            self._coverage = self.PARTIAL
+
+    def __setitem__(self, coord: Coord, index: int):
+        self._pixels[coord[1] * ScreenInfo.WIDTH + coord[0]] = index
+        self._cover(index)
+
+    def __getitem__(self, coord: Coord):
+        return self._pixels[coord[1] * ScreenInfo.WIDTH + coord[0]]
+
+    def set_at(self, index: int, color_index: int):
+        self._pixels[index] = color_index
+        self._cover(color_index)
+
+    def get_pixels(self):
+        # Whatever gets written to the pixels is unknown from here
+        self._coverage = self.PARTIAL
+        return self._pixels
+
+    def get_row(self, index: int):
+        width = ScreenInfo.WIDTH
+        return memoryview(self.get_pixels())[index * width:(index + 1) * width]
+
+    def clear(self):
+        self._pixels[:] = self._blank
+        self._coverage = self.EMPTY
+
+    def fill_with(self, index: int):
+        pixels = self._pixels
+        for i in range(len(pixels)):
+            pixels[i] = index
+        self._coverage = index and self.OPAQUE or self.EMPTY
+
+    def __iter__(self):
+        colors = self._palette._colors
+        n_colors = len(colors)
+        pixels = self._pixels
+        for row in self._WIRING:
+            for i in row:
+                index = pixels[i]
+                yield colors[index] if index < n_colors else None
+
+    def _expand_into(self, buffer: bytearray):
+        # Straight to the strip's bytes, no color tuples in between
+        colors = self._palette._bytes
+        pixels = self._pixels
+        j = 0
+        for row in self._WIRING:
+            for i in row:
+                offset = 3 * pixels[i]
+                buffer[j] = colors[offset]
+                buffer[j + 1] = colors[offset + 1]
+                buffer[j + 2] = colors[offset + 2]
+                j += 3
+
+class BitmapFont():
+    # Glyphs are stored column by column, one byte
+    # per column with the top row in the lowest bit
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        chars: str,
+        glyphs: bytes,
+        cache_size: int=16
+    ):
+        self.width = width
+        self.height = height
+        self._glyphs = glyphs
+        self._offsets = {char: i * width for i, char in enumerate(chars)}
+        self._missing = self._offsets.get("?", 0)
+        self._cache: dict[str, bytes] = {}
+        self._cache_size = cache_size
+
+    def measure(self, text: str):
+        return max(len(text) * (self.width + 1) - 1, 0)
+
+    def render(self, text: str) -> bytes:
+        # Rendered texts are kept as column masks, keyed by the text
+        mask = self._cache.get(text)
+        if mask is not None:
+            return mask
+        width = self.width
+        glyphs = self._glyphs
+        offsets = self._offsets
+        columns = bytearray(self.measure(text))
+        for i, char in enumerate(text):
+            offset = offsets.get(char)
+            if offset is None:
+                offset = offsets.get(char.upper(), self._missing)
+            start = i * (width + 1)
+            columns[start:start + width] = glyphs[offset:offset + width]
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        mask = self._cache[text] = bytes(columns)
+        return mask
+
+FONT_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ !?.,:-+/'%<>=*"
+FONT_3X5 = BitmapFont(
+    3,
+    5,
+    FONT_CHARS,
+    b"\x1f\x11\x1f\x12\x1f\x10\x19\x15\x12\x11\x15\x0a\x07\x04\x1f\x17"
+    b"\x15\x09\x1e\x15\x1d\x01\x1d\x03\x1f\x15\x1f\x17\x15\x0f\x1e\x05"
+    b"\x1e\x1f\x15\x0a\x0e\x11\x11\x1f\x11\x0e\x1f\x15\x11\x1f\x05\x01"
+    b"\x0e\x11\x1d\x1f\x04\x1f\x11\x1f\x11\x08\x10\x0f\x1f\x04\x1b\x1f"
+    b"\x10\x10\x1f\x06\x1f\x1f\x01\x1e\x0e\x11\x0e\x1f\x05\x02\x0e\x19"
+    b"\x16\x1f\x05\x1a\x12\x15\x09\x01\x1f\x01\x1f\x10\x1f\x0f\x10\x0f"
+    b"\x1f\x0c\x1f\x1b\x04\x1b\x03\x1c\x03\x19\x15\x13\x00\x00\x00\x00"
+    b"\x17\x00\x01\x15\x02\x00\x10\x00\x10\x08\x00\x00\x0a\x00\x04\x04"
+    b"\x04\x04\x0e\x04\x18\x04\x03\x00\x03\x00\x19\x04\x13\x04\x0a\x11"
+    b"\x11\x0a\x04\x0a\x0a\x0a\x0a\x04\x0a"
+)
+FONT_4X6 = BitmapFont(
+    4,
+    6,
+    FONT_CHARS,
+    b"\x1e\x29\x25\x1e\x22\x3f\x20\x00\x32\x29\x25\x22\x21\x25\x25\x1a"
+    b"\x0c\x0a\x3f\x08\x27\x25\x25\x19\x1e\x25\x25\x18\x01\x39\x05\x03"
+    b"\x1a\x25\x25\x1a\x06\x29\x29\x1e\x3e\x09\x09\x3e\x3f\x25\x25\x1a"
+    b"\x1e\x21\x21\x12\x3f\x21\x21\x1e\x3f\x25\x25\x21\x3f\x05\x05\x01"
+    b"\x1e\x21\x25\x3c\x3f\x04\x04\x3f\x21\x3f\x21\x00\x10\x20\x21\x1f"
+    b"\x3f\x04\x0a\x31\x3f\x20\x20\x20\x3f\x06\x06\x3f\x3f\x02\x04\x3f"
+    b"\x1e\x21\x21\x1e\x3f\x09\x09\x06\x1e\x21\x11\x2e\x3f\x09\x19\x26"
+    b"\x22\x25\x25\x19\x01\x3f\x01\x01\x1f\x20\x20\x1f\x0f\x30\x30\x0f"
+    b"\x3f\x18\x18\x3f\x33\x0c\x0c\x33\x03\x3c\x04\x03\x31\x29\x25\x23"
+    b"\x00\x00\x00\x00\x00\x2f\x00\x00\x02\x29\x05\x02\x00\x20\x00\x00"
+    b"\x20\x10\x00\x00\x00\x12\x00\x00\x04\x04\x04\x04\x04\x0e\x04\x00"
+    b"\x20\x18\x06\x01\x00\x03\x00\x00\x33\x0b\x34\x33\x04\x0a\x11\x00"
+    b"\x11\x0a\x04\x00\x0a\x0a\x0a\x0a\x12\x0c\x0c\x12"
+)
+
+class TextLayer(ScreenLayer):
+    # Heads-up display over the grid, drawn from the font's cached masks
+
+    def __init__(self, font: BitmapFont, timers: TimerWheel):
+        super().__init__()
+        self._font = font
+        self._timers = timers
+        self._timer: Optional[Timer] = None
+        self._n_changes = 0
+        self._scroll_mask = b""
+        self._scroll_x = 0
+        self._scroll_y = 0
+        self._scroll_color: tuple[int, int, int] = PixelColors.WHITE
+        self._scroll_background: tuple[int, int, int] | None = None
+
+    @property
+    def font(self):
+        return self._font
+
+    @property
+    def is_scrolling(self):
+        return bool(self._timer and self._timer.is_scheduled)
+
+    def _cover(self, pixel: tuple[int, int, int] | None):
+        super()._cover(pixel)
+        self._n_changes += 1
+
+    def _blit(
+        self,
+        mask: bytes,
+        x: int,
+        y: int,
+        start: int,
+        stop: int,
+        color: tuple[int, int, int],
+        background: tuple[int, int, int] | None
+    ):
+        # Screen columns from start to stop, read from the mask at x
+        rows = self._matrix[max(y, 0):y + self._font.height]
+        if not rows:
+            return
+        shift = max(-y, 0)
+        n_columns = len(mask)
+        for screen_x in range(max(start, 0), min(stop, ScreenInfo.WIDTH)):
+            i = screen_x - x
+            column = mask[i] >> shift if 0 <= i < n_columns else 0
+            for row in rows:
+                row[screen_x] = column & 1 and color or background
+                column >>= 1
+        self._coverage = self.PARTIAL
+        self._n_changes += 1
+
+    def write(
+        self,
+        text: str,
+        x: int=0,
+        y: int=0,
+        color: tuple[int, int, int]=PixelColors.WHITE,
+        background: tuple[int, int, int] | None=None
+    ):
+        mask = self._font.render(text)
+        self._blit(mask, x, y, x, x + len(mask), color, background)
+        return len(mask)
+
+    def scroll(
+        self,
+        text: str,
+        y: int=0,
+        period: int=4,
+        color: tuple[int, int, int]=PixelColors.WHITE,
+        background: tuple[int, int, int] | None=None
+    ):
+        # Enters from the right, moving one column every period frames
+        self.stop_scrolling()
+        self._scroll_mask = self._font.render(text)
+        self._scroll_x = ScreenInfo.WIDTH
+        self._scroll_y = y
+        self._scroll_color = color
+        self._scroll_background = background
+        self._timer = self._timers.every(period, self._scroll, 0)
+
+    def _scroll(self):
+        # Only the marquee's rows are redrawn, shifted by a column
+        x = self._scroll_x - 1
+        if x < -len(self._scroll_mask):
+            x = ScreenInfo.WIDTH
+        self._scroll_x = x
+        self._blit(
+            self._scroll_mask,
+            x,
+            self._scroll_y,
+            0,
+            ScreenInfo.WIDTH,
+            self._scroll_color,
+            self._scroll_background
+        )
+
+    def stop_scrolling(self):
+        if not self.is_scrolling:
+            return
+        self._timer.cancel()
+        for row in self._matrix[
+            max(self._scroll_y, 0):self._scroll_y + self._font.height
+        ]:
+            self._clear_row(row)
+        self._n_changes += 1
+
+    def clear(self):
+        if self._timer:
+            self._timer.cancel()
+        super().clear()
+        self._n_changes += 1
+
+    def fill_with(self, pixel: tuple[int, int, int]):
+        super().fill_with(pixel)
+        self._n_changes += 1
+
+class OutputStage():
+    # Rough WS2812 draw: a fully lit channel takes about 20 mA
+    # and every LED idles at about 1 mA
+    CHANNEL_MA = 20
+    IDLE_MA = 1
+    # Limits are only relaxed once they're this far off
+    _RELAX_STEP = 8
+
+    def __init__(
+        self,
+        n_leds: int,
+        gamma: float=1.0,
+        brightness: int=255,
+        max_current_ma: int=0
+    ):
+        self._n_leds = n_leds
+        brightness = max(0, min(brightness, 255))
+        self._base = bytes(
+            round((i / 255) ** gamma * brightness)
+            for i in range(256)
+        )
+        self._lut = bytearray(self._base)
+        # Budget in summed channel values, what's left after idling
+        self._budget = max_current_ma and max(
+            (max_current_ma - n_leds * self.IDLE_MA) *
+            255 // self.CHANNEL_MA,
+            1
+        )
+        self._is_identity = self._base == bytes(range(256))
+        self._limit = 255
+        self._total = 0
+        self._limited = 0
+
+    @property
+    def current_ma(self):
+        return (
+            self._n_leds * self.IDLE_MA +
+            self._total * self.CHANNEL_MA // 255
+        )
+
+    def _set_limit(self, limit: int):
+        self._limit = limit
+        lut = self._lut
+        base = self._base
+        for i in range(256):
+            lut[i] = base[i] * limit // 255
+
+    def _apply(self, buffer: bytearray):
+        budget = self._budget
+        if self._is_identity and not budget:
+            return
+        lut = self._lut
+        total = 0
+        for i in range(len(buffer)):
+            value = buffer[i] = lut[buffer[i]]
+            total += value
+        self._total = total
+        if not budget:
+            return
+        limit = self._limit
+        if total > budget:
+            # Only frames over budget take a second pass
+            for i in range(len(buffer)):
+                buffer[i] = buffer[i] * budget // total
+            self._total = budget
+            self._limited += 1
+            self._set_limit(max(limit * budget // total, 1))
+        elif limit < 255:
+            # Where the limit would land with this frame
+            target = total and min(limit * budget // total, 255) or 255
+            if target - limit >= self._RELAX_STEP or target == 255:
+                self._set_limit(target)
+
+    def summary(self):
+        return {
+            "limit": self._limit,
+            "limited": self._limited,
+            "current_ma": self.current_ma
+        }
+
+class FrameWriter():
+    # Sends finished frames from another thread, so the strip's ~8 ms
+    # bitstream overlaps with the next frame instead of stalling it
+    def __init__(
+        self,
+        neopixel: NeoPixel,
+        write: Callable[[bytearray], Any] | None=None
+    ):
+        self._neopixel = neopixel
+        self._write = write or self._bitstream
+        self._buffers = neopixel.buf, bytearray(len(neopixel.buf))
+        self._pending: Optional[bytearray] = None
+        self._error: Optional[Exception] = None
+        self._n_waits = 0
+        self._is_running = True
+        # Released once a frame is pending, and once it's been sent
+        self._ready = allocate_lock()
+        self._ready.acquire()
+        self._idle = allocate_lock()
+        start_new_thread(self._run, ())
+
+    def _bitstream(self, buffer: bytearray):
+        neopixel = self._neopixel
+        bitstream(neopixel.pin, 0, neopixel.timing, buffer)
+
+    def _run(self):
+        while True:
+            self._ready.acquire()
+            buffer = self._pending
+            if buffer is None:
+                return
+            try:
+                self._write(buffer)
+            except Exception as e:
+                self._error = e
+            self._idle.release()
+
+    def submit(self):
+        idle = self._idle
+        if not idle.acquire(0):
+            self._n_waits += 1
+            idle.acquire()
+        error = self._error
+        if error:
+            self._error = None
+            idle.release()
+            raise error
+        neopixel = self._neopixel
+        buffer = self._pending = neopixel.buf
+        self._ready.release()
+        # The next frame is drawn over the buffer that was just sent
+        buffers = self._buffers
+        neopixel.buf = buffers[buffer is buffers[0]]
+
+    def stop(self):
+        if not self._is_running:
+            return
+        self._is_running = False
+        self._idle.acquire()
+        self._pending = None
+        self._ready.release()
+
 class ScreenRenderer():
-    def __init__(self):
+    def __init__(self, output: OutputStage | None=None):
+        n_leds = ScreenInfo.WIDTH * ScreenInfo.HEIGHT
         self._layers: list[ScreenLayer] = []
-        self._neopixel = NeoPixel(
-            Pin(LED_PIN),
-            ScreenInfo.WIDTH * ScreenInfo.HEIGHT
-        )
+        self._visible_layers: list[ScreenLayer] = []
+        self._output = output or OutputStage(n_leds)
+        self._neopixel = NeoPixel(Pin(LED_PIN), n_leds)
+        self._writer: Optional[FrameWriter] = None
+
+    def _start_writer(self, write: Callable[[bytearray], Any] | None=None):
+        self._writer = FrameWriter(self._neopixel, write)
+
+    def _stop_writer(self):
+        if self._writer:
+            self._writer.stop()
+            self._writer = None
 
     def new_layer(self) -> ScreenLayer:
         layer = ScreenLayer()
         self._layers.append(layer)
         return layer
-    
+
+    def new_palette_layer(self, palette: Palette) -> PaletteLayer:
+        layer = PaletteLayer(palette)
+        self._layers.append(layer)
+        return layer
+
+    def new_text_layer(
+        self,
+        font: BitmapFont,
+        timers: TimerWheel
+    ) -> TextLayer:
+        layer = TextLayer(font, timers)
+        self._layers.append(layer)
+        return layer
+
     @classmethod
     def _choose_pixel(cls, pixels: tuple[tuple[int, int, int] | None]):
         for pixel in pixels:
@@ -643,24 +1688,50 @@ class ScreenRenderer():
                 return pixel
         return PixelColors.OFF
     
+    def _get_visible_layers(self):
+        layers = self._visible_layers
+        layers.clear()
+        for layer in self._layers:
+            coverage = layer._coverage
+            if coverage == ScreenLayer.EMPTY:
+                continue
+            layers.append(layer)
+            # Nothing below an opaque layer can show through
+            if coverage == ScreenLayer.OPAQUE:
+                break
+        return layers
+
     def _get_pixel_values(self):
-        return map(self._choose_pixel, zip(*self._layers))
+        layers = self._get_visible_layers()
+        if len(layers) == 1:
+            pixel_off = PixelColors.OFF
+            return (pixel or pixel_off for pixel in layers[0])
+        return map(self._choose_pixel, zip(*layers))
     
     def render(self):
-        for i, pixel in enumerate(self._get_pixel_values()):
-            self._neopixel[i] = pixel
-        self._neopixel.write()
-
-class AnimationDoneError(Exception): ...
+        layers = self._get_visible_layers()
+        if not layers:
+            self._neopixel.fill(PixelColors.OFF)
+        elif len(layers) == 1 and isinstance(layers[0], PaletteLayer):
+            layers[0]._expand_into(self._neopixel.buf)
+        else:
+            for i, pixel in enumerate(self._get_pixel_values()):
+                self._neopixel[i] = pixel
+        self._output._apply(self._neopixel.buf)
+        if self._writer:
+            self._writer.submit()
+        else:
+            self._neopixel.write()
 
 class GameAnimation():
     _n_stages: int
     _stage_duration: int
-    _ADE = AnimationDoneError()
 
-    def __init__(self, loop: GameLoop, renderer: ScreenRenderer):
-        self._loop = loop
+    def __init__(self, animator: 'Animator', renderer: ScreenRenderer):
+        self._animator = animator
+        self._timers = animator._timers
         self._layer = renderer.new_layer()
+        self._timer = Timer(self._switch_stage, self._stage_duration)
         self._is_active = False
         self._post_init()
     
@@ -668,22 +1739,28 @@ class GameAnimation():
 
     def _on_stage_switch(self, n_stage: int): ...
 
+    def _switch_stage(self):
+        self._on_stage_switch(
+            self._timers.tick //
+            self._stage_duration %
+            self._n_stages
+        )
+
     def _activate(self):
+        if self._is_active:
+            return
         self._is_active = True
+        self._animator._active.append(self)
+        # Stages stay aligned to multiples of their duration
+        duration = self._stage_duration
+        self._timers.start(self._timer, duration - self._timers.tick % duration)
 
     def _deactivate(self):
-        self._is_active = False
-        self._layer.clear()
-
-    def run(self):
         if self._is_active:
-            if self._loop.i % self._stage_duration == 0:
-                self._on_stage_switch(
-                    self._loop.i //
-                    self._stage_duration %
-                    self._n_stages
-                )
-            raise self._ADE
+            self._is_active = False
+            self._animator._active.remove(self)
+        self._timer.cancel()
+        self._layer.clear()
 
 class BlockBlinker(GameAnimation):
     _stage_duration = 2
@@ -691,25 +1768,24 @@ class BlockBlinker(GameAnimation):
     
     def _post_init(self):
         self._n_blinks = 0
-        self._coords: list[Coord] = []
+        self._indexes: list[int] = []
 
     def _deactivate(self):
         super()._deactivate()
         self._n_blinks = 0
-        self._coords.clear()
+        self._indexes.clear()
 
-    def add_coordinate(self, coord: Coord):
+    def add_coordinate(self, coord: int):
         self._activate()
-        max_length = GameBlock._max_length
-        if coord[0] >= max_length and coord[1] >= max_length:
-            coord = coord[0] - max_length, coord[1] - max_length
-            self._coords.append(coord)
+        index = GridGeometry.to_screen_index(coord)
+        if index >= 0:
+            self._indexes.append(index)
     
     def _on_stage_switch(self, n_stage):
         pixel_off = PixelColors.OFF #Caching...
         if n_stage:
-            for coord in self._coords:
-                self._layer[coord] = pixel_off
+            for index in self._indexes:
+                self._layer.set_at(index, pixel_off)
             self._n_blinks += 1
             if self._n_blinks > 12:
                 self._deactivate()
@@ -738,119 +1814,561 @@ class BlinkingXOnError(GameAnimation):
             self._layer.clear()
 
 class Animator():
-    def __init__(
-        self,
-        animations: dict[type[GameAnimation], GameAnimation]
-    ):
-        self._animations = animations
+    def __init__(self, timers: TimerWheel):
+        self._timers = timers
+        self._animations: dict[type[GameAnimation], GameAnimation] = {}
+        self._active: list[GameAnimation] = []
 
     @classmethod
     def new(
         cls,
-        loop: GameLoop,
         renderer: ScreenRenderer,
         *animation_classes: type[GameAnimation]
     ):
-        animations = dict(
-            (animation_cls, animation_cls(loop, renderer))
-            for animation_cls in animation_classes
-        )
-        return cls(animations)
+        animator = cls(TimerWheel())
+        for animation_cls in animation_classes:
+            animator._animations[animation_cls] = animation_cls(
+                animator,
+                renderer
+            )
+        return animator
     
     def get[C: GameAnimation](self, animation_cls: type[C]) -> C:
         return self._animations[animation_cls]
-    
-    def __enter__(self):
-        return self._run
-    
-    def __exit__(self, exc_type: type[Exception] | None, *_):
-        return exc_type is AnimationDoneError
-
-    def _run(self):
-        for animation in self._animations.values():
-            animation.run()
 
+    def run(self):
+        # The frame an animation ends on is still held by it
+        is_running = bool(self._active)
+        self._timers._advance()
+        return is_running
 
+@init_class
+class ParticleSystem():
+    # Positions and velocities are fixed point, in 1/256 of a pixel
+    _FIXED_SHIFT = 8
+    _N_SHADES = 8
+    _N_DIRECTIONS = 16
 
-class BlockPool():
-    def __init__(self):
-        self._cache: dict[type[GameBlock], list[GameBlock]] = {}
-        self._pool = set[GameBlock]()
-        self._to_remove = set[GameBlock]()
-        self._to_add: list[GameBlock] = []
+    @classmethod
+    def __init_class__(cls):
+        cls._DIRECTIONS = tuple(
+            (cos(angle), sin(angle))
+            for angle in (
+                2 * pi * i / cls._N_DIRECTIONS
+                for i in range(cls._N_DIRECTIONS)
+            )
+        )
 
-    def __iter__(self):
-        return iter(self._pool)
-    
-    def _get_cache(self, block_type: type[GameBlock]):
+    def __init__(self, renderer: ScreenRenderer, capacity: int):
+        self._layer = renderer.new_layer()
+        self._capacity = capacity
+        self._xs = array("h", bytes(2 * capacity))
+        self._ys = array("h", bytes(2 * capacity))
+        self._dxs = array("h", bytes(2 * capacity))
+        self._dys = array("h", bytes(2 * capacity))
+        self._lives = array("H", bytes(2 * capacity))
+        self._lifetimes = array("H", bytes(2 * capacity))
+        self._colors: list[tuple | None] = [None] * capacity
+        self._drawn = array("H", bytes(2 * capacity))
+        self._shades: dict[tuple[int, int, int], tuple] = {}
+        self._n = 0
+        self._n_drawn = 0
+        self._dropped = 0
+
+    def _to_fixed(self, value: float):
+        # Saturated to the arrays' 16 bits, past 128 pixels away or per
+        # frame the particle is culled on its first run anyway
+        return min(max(int(value * (1 << self._FIXED_SHIFT)), -0x8000), 0x7FFF)
+
+    def _get_shades(self, color: tuple[int, int, int]):
+        # Built once per color, fading never allocates afterwards
         try:
-            return self._cache[block_type]
+            return self._shades[color]
         except KeyError:
-            return self._cache.setdefault(block_type, [])
-    
-    def _get_cached(self, block_type: type[GameBlock]):
+            pass
+        n_shades = self._N_SHADES
+        shades = self._shades[color] = tuple(
+            tuple(channel * (i + 1) // n_shades for channel in color)
+            for i in range(n_shades)
+        )
+        return shades
+
+    def emit(
+        self,
+        coord: tuple[float, float],
+        velocity: tuple[float, float]=(0, 0),
+        color: tuple[int, int, int]=PixelColors.WHITE,
+        lifetime: int=ScreenInfo.REFRESH_RATE // 2,
+        fade: bool=True
+    ):
+        i = self._n
+        if i == self._capacity or lifetime < 1:
+            self._dropped += 1
+            return False
+        self._n += 1
+        self._xs[i] = self._to_fixed(coord[0])
+        self._ys[i] = self._to_fixed(coord[1])
+        self._dxs[i] = self._to_fixed(velocity[0])
+        self._dys[i] = self._to_fixed(velocity[1])
+        self._lives[i] = lifetime
+        # A zero lifetime marks particles that keep their color
+        self._lifetimes[i] = lifetime if fade else 0
+        self._colors[i] = self._get_shades(color) if fade else color
+        return True
+
+    def burst(
+        self,
+        coord: tuple[float, float],
+        color: tuple[int, int, int]=PixelColors.WHITE,
+        n: int=8,
+        speed: float=0.25,
+        lifetime: int=ScreenInfo.REFRESH_RATE // 2,
+        fade: bool=True
+    ):
+        n_emitted = 0
+        for i in range(n):
+            dx, dy = self._DIRECTIONS[i * self._N_DIRECTIONS // n]
+            n_emitted += self.emit(
+                coord,
+                (dx * speed, dy * speed),
+                color,
+                lifetime,
+                fade
+            )
+        return n_emitted
+
+    def clear(self):
+        for i in range(self._n):
+            self._colors[i] = None
+        self._n = 0
+
+    def _erase(self):
+        layer = self._layer
+        drawn = self._drawn
+        for i in range(self._n_drawn):
+            layer.set_at(drawn[i], None)
+        self._n_drawn = 0
+
+    def run(self):
+        if not self._n and not self._n_drawn:
+            return
+        self._erase()
+        layer = self._layer
+        xs, ys = self._xs, self._ys
+        dxs, dys = self._dxs, self._dys
+        lives, lifetimes = self._lives, self._lifetimes
+        colors = self._colors
+        drawn = self._drawn
+        shift = self._FIXED_SHIFT
+        n_shades = self._N_SHADES
+        width, height = ScreenInfo.WIDTH, ScreenInfo.HEIGHT
+        n = self._n
+        n_drawn = 0
+        i = 0
+        while i < n:
+            life = lives[i] - 1
+            x = xs[i] + dxs[i]
+            y = ys[i] + dys[i]
+            px = x >> shift
+            py = y >> shift
+            if life <= 0 or not (0 <= px < width and 0 <= py < height):
+                # Swapped with the last one, which is updated next
+                n -= 1
+                xs[i], ys[i] = xs[n], ys[n]
+                dxs[i], dys[i] = dxs[n], dys[n]
+                lives[i], lifetimes[i] = lives[n], lifetimes[n]
+                colors[i] = colors[n]
+                colors[n] = None
+                continue
+            lives[i] = life
+            xs[i] = x
+            ys[i] = y
+            lifetime = lifetimes[i]
+            color = colors[i]
+            if lifetime:
+                color = color[(life * n_shades - 1) // lifetime]
+            index = py * width + px
+            layer.set_at(index, color)
+            drawn[n_drawn] = index
+            n_drawn += 1
+            i += 1
+        self._n = n
+        self._n_drawn = n_drawn
+        if not n_drawn:
+            self._layer.clear()
+
+
+
+class BlockPool():
+    def __init__(self, guard: PoolGuard):
+        self._guard = guard
+        self._cache: dict[type[GameBlock], list[GameBlock]] = {}
+        self._blocks: list[GameBlock] = []
+        self._members: dict[type[GameBlock], list[GameBlock]] = {}
+        self._active: list[GameBlock] = []
+        self._to_remove: list[GameBlock] = []
+        self._to_add: list[GameBlock] = []
+
+    def __iter__(self):
+        return iter(self._blocks)
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def active(self):
+        return iter(self._active)
+
+    def placed(self):
+        for block in self._blocks:
+            if not block._is_deleted:
+                yield block
+        for block in self._to_add:
+            if not block._is_deleted:
+                yield block
+
+    def of(self, block_type: type[GameBlock]):
+        try:
+            return self._members[block_type]
+        except KeyError:
+            return self._members.setdefault(block_type, [])
+    
+    def _get_cache(self, block_type: type[GameBlock]):
+        try:
+            return self._cache[block_type]
+        except KeyError:
+            return self._cache.setdefault(block_type, [])
+    
+    def _get_cached(self, block_type: type[GameBlock]):
         try:
             return self._get_cache(block_type).pop()
         except IndexError:
-            return block_type()
+            return self._guard.grow(block_type.__name__, block_type)
+
+    def reserve(self, block_type: type[GameBlock], capacity: int):
+        self._guard.reserve(
+            block_type.__name__,
+            self._get_cache(block_type),
+            capacity,
+            block_type
+        )
     
     def _to_cache(self, block: GameBlock):
         self._get_cache(type(block)).append(block)
 
+    def _insert(self, block: GameBlock):
+        block._pool_i = len(self._blocks)
+        self._blocks.append(block)
+        for block_type in type(block)._lineage:
+            members = self.of(block_type)
+            block._members_at[block_type] = len(members)
+            members.append(block)
+        if not block._is_sleeping:
+            self._activate(block)
+
+    def _activate(self, block: GameBlock):
+        block._active_i = len(self._active)
+        self._active.append(block)
+
+    def _deactivate(self, block: GameBlock):
+        last = self._active.pop()
+        if last is not block:
+            self._active[block._active_i] = last
+            last._active_i = block._active_i
+        block._active_i = -1
+
+    def _discard(self, block: GameBlock):
+        last = self._blocks.pop()
+        if last is not block:
+            self._blocks[block._pool_i] = last
+            last._pool_i = block._pool_i
+        for block_type in type(block)._lineage:
+            members = self._members[block_type]
+            last = members.pop()
+            if last is not block:
+                i = block._members_at[block_type]
+                members[i] = last
+                last._members_at[block_type] = i
+        if block._active_i >= 0:
+            self._deactivate(block)
+        block._pool_i = -1
+
     def flush(self):
-        for block in self._to_remove:
-            self._pool.remove(block)
-        self._pool.update(self._to_add)
+        for block in self._to_add:
+            self._insert(block)
         self._to_add.clear()
+        for block in self._to_remove:
+            self._discard(block)
+            self._to_cache(block)
         self._to_remove.clear()
 
+    def sleep(self, block: GameBlock):
+        if block._is_sleeping:
+            return
+        block._is_sleeping = True
+        block._abort_moves()
+        if block._active_i >= 0:
+            self._deactivate(block)
+
+    def wake(self, block: GameBlock):
+        block._is_sleeping = False
+        block._idle_frames = 0
+        if block._pool_i >= 0 and block._active_i < 0:
+            self._activate(block)
+
+    def settle(self):
+        active = self._active
+        for i in range(len(active) - 1, -1, -1):
+            block = active[i]
+            block._idle_frames += 1
+            if block.sleep_after and block._idle_frames > block.sleep_after:
+                self.sleep(block)
+
     def delete(self, block: GameBlock):
-        if block in self._to_remove:
+        if block._is_deleted:
             return False
-        self._to_remove.add(block)
-        self._to_cache(block)
+        block._is_deleted = True
+        self._to_remove.append(block)
         return True
 
     def new(self, block_type: type[GameBlock]):
         block = self._get_cached(block_type)
+        block._pool = self
+        block._is_deleted = False
+        block._is_sleeping = False
+        block._idle_frames = 0
         self._to_add.append(block)
         return block
 
     def clear(self):
-        self._pool.clear()
-
-class GameGrid(Matrix[GridSlot]):
+        self.flush()
+        for block in self._blocks:
+            block._pool_i = -1
+            block._active_i = -1
+            block._is_deleted = True
+            self._to_cache(block)
+        self._blocks.clear()
+        self._active.clear()
+        for members in self._members.values():
+            members.clear()
+
+class GameGrid():
     _OOBE = OutOfBoundsError()
 
     def __init__(
         self,
         renderer: ScreenRenderer,
-        block_pool: BlockPool
+        block_pool: BlockPool,
+        palette: Palette | None=None
     ):
-        super().__init__(GameBlock._max_length)
         self._block_pool = block_pool
-        self._ops = lt, ge
-        self._layer = renderer.new_layer()
-        self._view = self._get_view()
+        # Visible slots are created up front, off-screen ones
+        # only once a block crossing a corner reaches them
+        self._slots: dict[int, GridSlot] = {}
+        self._occupancy = GridSlot._occupancy = bytearray(GridGeometry.SIZE)
+        self._fields = GridSlot._fields = []
+        self._place_masks: dict[tuple[type[GameBlock], int], PlaceMask] = {}
+        self._off_screen: Optional[bytearray] = None
+        self._palette = palette
+        self._has_cell_colors = False
+        GameBlock._grid = self
+        self._layer = (
+            palette and renderer.new_palette_layer(palette) or
+            renderer.new_layer()
+        )
+        self._view = self._new_view()
 
-    @staticmethod
-    def _new_cell(coord: Coord):
-        return GridSlot(coord)
-
-    def _get_slot(self, coord: Coord, block: type[GameBlock] | GameBlock):
-        corners = [
-            corner
-            for i, (bounding, corner) in enumerate(
-                zip(block._boundings, BOUNDING_CORNERS)
+    def _new_slot(self, coord: int):
+        slot = self._slots[coord] = GridSlot(coord)
+        return slot
+
+    def _new_view(self):
+        border = GridGeometry.BORDER
+        start = gc.mem_alloc()
+        view = tuple(
+            tuple(
+                self._new_slot(GridGeometry.pack((x, y)))
+                for x in range(border, border + ScreenInfo.WIDTH)
             )
-            if self._ops[i//2](coord[i%2], bounding)
-        ]
+            for y in range(border, border + ScreenInfo.HEIGHT)
+        )
+        self._slot_bytes = max(gc.mem_alloc() - start, 0) // len(self._slots)
+        return view
+
+    def __getitem__(self, coord: int) -> GridSlot | None:
+        return self._slots.get(coord)
+
+    def footprint(self):
+        inner_size = 2 * GridGeometry.BORDER
+        n_bordered = (
+            (ScreenInfo.WIDTH + inner_size) *
+            (ScreenInfo.HEIGHT + inner_size)
+        )
+        n_slots = len(self._slots)
+        # The padded geometry pays for these per SIZE coord instead
+        buffer_bytes = len(self._occupancy) + sum(
+            len(mask) for mask in GridGeometry._bounds_masks.values()
+        )
+        if self._off_screen is not None:
+            buffer_bytes += len(self._off_screen)
+        return {
+            "slots": n_slots,
+            "visible": ScreenInfo.WIDTH * ScreenInfo.HEIGHT,
+            "bordered": n_bordered,
+            "buffer_bytes": buffer_bytes,
+            "saved_bytes": (
+                (n_bordered - n_slots) * self._slot_bytes - buffer_bytes
+            )
+        }
+
+    def _full_rows(self):
+        return [y for y, row in enumerate(self._view) if all(row)]
+
+    def _collect_rows(
+        self,
+        rows: Iterable[int]
+    ) -> OrderedDict[GameBlock, list[int]]:
+        cells = OrderedDict()
+        for row in rows:
+            for slot in self._view[row]:
+                for block in slot:
+                    try:
+                        cells[block].append(slot._coord)
+                    except KeyError:
+                        cells[block] = [slot._coord]
+        return cells
+
+    def _collect_region(
+        self,
+        region: tuple[int, int, int, int]
+    ) -> OrderedDict[GameBlock, list[int]]:
+        region_start, region_end, col_start, col_end = region
+        stride = GridGeometry.STRIDE
+        cells = OrderedDict()
+        for block in self._block_pool.placed():
+            for coord in block._pos:
+                if (
+                    region_start <= coord < region_end and
+                    col_start <= coord % stride < col_end
+                ):
+                    try:
+                        cells[block].append(coord)
+                    except KeyError:
+                        cells[block] = [coord]
+        return cells
+
+    def _blocks_in_region(self, region: tuple[int, int, int, int]):
+        region_start, region_end, col_start, col_end = region
+        occupancy = self._occupancy
+        blocks: list[GameBlock] = []
+        for row_start in range(region_start, region_end, GridGeometry.STRIDE):
+            for coord in range(row_start + col_start, row_start + col_end):
+                if occupancy[coord]:
+                    for block in self._slots[coord]:
+                        if block not in blocks:
+                            blocks.append(block)
+        return blocks
+
+    def _is_area_free(
+        self,
+        block_cls: type[GameBlock],
+        ref: int,
+        angle: int
+    ):
+        bounds_mask = block_cls._bounds_mask
+        occupancy = self._occupancy
+        for cell in block_cls._cells[angle]:
+            coord = ref + cell
+            if (
+                not 0 <= coord < GridGeometry.SIZE or
+                bounds_mask[coord] or
+                occupancy[coord]
+            ):
+                return False
+        return True
+
+    def _get_place_mask(self, block_cls: type[GameBlock], angle: int):
+        key = block_cls, angle
+        try:
+            return self._place_masks[key]
+        except KeyError:
+            pass
+        # Built on the first spawn, then kept up to date by slot edits
+        mask = self._place_masks[key] = PlaceMask(self, block_cls, angle)
+        self._fields.append(mask)
+        return mask
+
+    def _pick_place(
+        self,
+        block_cls: type[GameBlock],
+        angles: Iterable[int],
+        rect: tuple[int, int, int, int]
+    ):
+        masks = [self._get_place_mask(block_cls, angle) for angle in angles]
+        n_places = sum(mask.count(rect) for mask in masks)
+        if not n_places:
+            return -1
+        i = randrange(n_places)
+        for mask in masks:
+            ref = mask.find(rect, i)
+            if ref >= 0:
+                return ref << 2 | mask._angle
+            i = -ref - 1
+        return -1
+
+    def _raycast(self, coord: int, delta: int, steps: int):
+        occupancy = self._occupancy
+        for _ in range(steps):
+            coord += delta
+            if occupancy[coord]:
+                return self._slots[coord].front
+        return None
+
+    def _get_off_screen_mask(self):
+        if self._off_screen is None:
+            self._off_screen = bytearray(b"\x01" * GridGeometry.SIZE)
+            for row in self._view:
+                for slot in row:
+                    self._off_screen[slot._coord] = 0
+        return self._off_screen
+
+    def _get_slot(self, coord: int, block: type[GameBlock] | GameBlock):
+        corners = block._bounds_mask[coord]
         if corners:
             wall_corners = WallCorners._get_cached()
-            wall_corners.__init__(corners)
+            wall_corners.__init__([
+                corner
+                for i, corner in enumerate(BOUNDING_CORNERS)
+                if corners >> i & 1
+            ])
             self._OOBE.set_and_raise(wall_corners)
-        return self[coord]
+        try:
+            return self._slots[coord]
+        except KeyError:
+            return self._new_slot(coord)
     
+    def _set_frame(self, block: GameBlock, i: int):
+        if i == block._frame_i:
+            return True
+        pos = block._pos
+        ref = pos.ref
+        bounds_mask = block._bounds_mask
+        cells = block._frame_cells[i]
+        for cell in cells[pos.ort_i % 4]:
+            coord = ref + cell
+            if not 0 <= coord < GridGeometry.SIZE or bounds_mask[coord]:
+                return False
+            slot = self._slots.get(coord)
+            if slot and (len(slot) > 1 or slot.front is not block):
+                return False
+        self._erase(block)
+        pos.offs = block._frame_offsets[i]
+        pos.cells = cells
+        pos.colors = block._frame_colors[i]
+        for coord in pos:
+            self._get_slot(coord, block).add(block)
+        block._frame_i = i
+        return True
+
     def _erase(self, block: GameBlock):
         for coord in block._pos:
             try:
@@ -883,36 +2401,305 @@ class GameGrid(Matrix[GridSlot]):
             block._pos.copy(pos)
 
     def _draw(self):
-        for y, row in enumerate(self):
-            for x, slot in enumerate(row):
-                self._layer[(x, y)] = slot and slot.front.color or None
+        if self._palette:
+            self._draw_indexes()
+        else:
+            for y, row in enumerate(self._view):
+                pixels = self._layer.get_row(y)
+                for x in range(len(row)):
+                    slot = row[x]
+                    pixels[x] = slot and slot.front.color or None
+        if self._has_cell_colors:
+            self._draw_cell_colors()
+
+    def _draw_cell_colors(self):
+        # Drawn over the block colors, only for blocks that have them
+        layer = self._layer
+        palette = self._palette
+        slots = self._slots
+        for block in self._block_pool.placed():
+            colors = block._pos.colors
+            if not colors:
+                continue
+            for coord, color in zip(block._pos, colors):
+                if not color:
+                    continue
+                index = GridGeometry.to_screen_index(coord)
+                slot = slots.get(coord)
+                if index >= 0 and slot and slot.front is block:
+                    layer.set_at(
+                        index,
+                        palette and palette.add(color) or color
+                    )
+
+    def _draw_indexes(self):
+        palette = self._palette
+        indexes = palette._indexes
+        pixels = self._layer.get_pixels()
+        i = 0
+        for row in self._view:
+            for slot in row:
+                color = slot and slot.front.color
+                pixels[i] = color and (
+                    indexes.get(color) or palette.add(color)
+                ) or Palette.TRANSPARENT
+                i += 1
 
-    def _get_view(self):
-        max_length = GameBlock._max_length
-        return tuple(
-            tuple(
-                islice(
-                    row,
-                    max_length,
-                    max_length + ScreenInfo.WIDTH
-                )
-            )
-            for row in islice(
-                self._matrix,
-                max_length,
-                max_length + ScreenInfo.HEIGHT
-            )
-        )
-    
     def __iter__(self):
         return iter(self._view)
 
     def __repr__(self):
         return "\n".join(
             " ".join(str(slot._slot) for slot in row)
-            for row in self._matrix
+            for row in self._view
         )
     
+class PlaceMask():
+    def __init__(
+        self,
+        grid: GameGrid,
+        block_cls: type[GameBlock],
+        angle: int
+    ):
+        self._grid = grid
+        self._angle = angle
+        self._cells = cells = block_cls._cells[angle]
+        self._offsets = offsets = tuple(
+            GridGeometry.unpack_offset(cell) for cell in cells
+        )
+        self._x_min = min(dx for dx, _ in offsets)
+        self._y_min = min(dy for _, dy in offsets)
+        # Spawns keep the whole shape on screen, so only the places of
+        # its top left corner that fit are kept, at most one byte per
+        # visible cell instead of one entry per padded grid coord
+        self._width = width = (
+            ScreenInfo.WIDTH - max(dx for dx, _ in offsets) + self._x_min
+        )
+        self._height = height = (
+            ScreenInfo.HEIGHT - max(dy for _, dy in offsets) + self._y_min
+        )
+        bounds_mask = block_cls._bounds_mask
+        occupancy = grid._occupancy
+        # Per place, how many cells of the shape would be out of bounds
+        # or occupied, so a spawn only has to look for zeros
+        blocked = self._blocked = array(
+            "B" if 2 * len(cells) < 256 else "H",
+            bytes(max(width, 0) * max(height, 0))
+        )
+        i = 0
+        for y in range(height):
+            for x in range(width):
+                ref = self._to_ref(x, y)
+                n_blocked = 0
+                for cell in cells:
+                    coord = ref + cell
+                    # Counted apart, as only the occupancy changes later
+                    if bounds_mask[coord]:
+                        n_blocked += 1
+                    if occupancy[coord]:
+                        n_blocked += 1
+                blocked[i] = n_blocked
+                i += 1
+
+    def _to_ref(self, x: int, y: int):
+        return GridGeometry.from_screen((x - self._x_min, y - self._y_min))
+
+    def _touch(self, coord: int, block: GameBlock | None):
+        # Slots only report turning empty or taken
+        blocked = self._blocked
+        width = self._width
+        height = self._height
+        step = 1 if self._grid._occupancy[coord] else -1
+        x, y = GridGeometry.unpack(coord)
+        x += self._x_min - GridGeometry.BORDER
+        y += self._y_min - GridGeometry.BORDER
+        for dx, dy in self._offsets:
+            if 0 <= x - dx < width and 0 <= y - dy < height:
+                blocked[(y - dy) * width + x - dx] += step
+
+    def _rows(self, rect: tuple[int, int, int, int]):
+        x, y, width, height = rect
+        # Only places keeping every cell of the shape inside the rect
+        x_end = x + width - ScreenInfo.WIDTH + self._width
+        for row in range(y, y + height - ScreenInfo.HEIGHT + self._height):
+            row_start = row * self._width
+            yield row, row_start + x, row_start + x_end
+
+    def count(self, rect: tuple[int, int, int, int]):
+        blocked = self._blocked
+        n_free = 0
+        for _, start, end in self._rows(rect):
+            for i in range(start, end):
+                if not blocked[i]:
+                    n_free += 1
+        return n_free
+
+    def find(self, rect: tuple[int, int, int, int], i: int):
+        # The ref of the i-th free place, or -1 - the free places left
+        blocked = self._blocked
+        for row, start, end in self._rows(rect):
+            for j in range(start, end):
+                if not blocked[j]:
+                    if not i:
+                        return self._to_ref(j - start + rect[0], row)
+                    i -= 1
+        return -1 - i
+
+class DistanceField():
+    UNREACHABLE = 255
+    _MOVES = (
+        None,
+        BlockMoves.SHIFT_LEFT,
+        BlockMoves.SHIFT_RIGHT,
+        BlockMoves.SHIFT_UP,
+        BlockMoves.SHIFT_DOWN
+    )
+
+    def __init__(
+        self,
+        grid: GameGrid,
+        target: Coord | type[GameBlock]
+    ):
+        self._grid = grid
+        self._target = target
+        self._off_screen = grid._get_off_screen_mask()
+        size = GridGeometry.SIZE
+        # Five bytes per coord of the padded grid, about 11.5 KB a field
+        # once a 5 cell long block sets the border
+        self._blank = bytes([self.UNREACHABLE]) * size
+        self._distances = bytearray(self._blank)
+        # Index into _MOVES of the step towards the target
+        self._moves = bytearray(size)
+        self._queue = array("H", bytes(2 * size))
+        self._deltas = (1, -1, GridGeometry.STRIDE, -GridGeometry.STRIDE)
+        self._is_dirty = True
+
+    def _touch(self, coord: int, block: GameBlock | None):
+        if self._is_dirty:
+            return
+        if block is not None and self._target in type(block)._lineage:
+            self._is_dirty = True
+            return
+        distances = self._distances
+        distance = distances[coord]
+        following = distance + 1
+        # Cells the last search didn't reach, or couldn't search past,
+        # can't change its result
+        if following >= self.UNREACHABLE:
+            return
+        if self._grid._occupancy[coord]:
+            # Targets are searched from even when covered
+            if not distance:
+                return
+            for delta in self._deltas:
+                neighbour = coord + delta
+                if (
+                    distances[neighbour] == following and
+                    not self._reroute(neighbour, coord)
+                ):
+                    self._is_dirty = True
+                    return
+            return
+        off_screen = self._off_screen
+        # An opened cell only matters if it's a shorter way in
+        for delta in self._deltas:
+            neighbour = coord + delta
+            if distances[neighbour] > following and not off_screen[neighbour]:
+                self._is_dirty = True
+                return
+
+    def _reroute(self, coord: int, wall: int):
+        # Whether the cell keeps its distance once the wall is up,
+        # stepping through another cell as near if it went through it
+        deltas = self._deltas
+        moves = self._moves
+        if coord - deltas[moves[coord] - 1] != wall:
+            return True
+        distances = self._distances
+        occupancy = self._grid._occupancy
+        distance = distances[wall]
+        move = 1
+        for delta in deltas:
+            parent = coord - delta
+            if (
+                parent != wall and
+                distances[parent] == distance and
+                (not distance or not occupancy[parent])
+            ):
+                moves[coord] = move
+                return True
+            move += 1
+        return False
+
+    def _get_sources(self):
+        if isinstance(self._target, tuple):
+            yield GridGeometry.from_screen(self._target)
+            return
+        # Blocks spawned this frame are targets too
+        for block in self._grid._block_pool.placed():
+            if self._target in type(block)._lineage:
+                yield from block._pos
+
+    def _build(self):
+        distances = self._distances
+        moves = self._moves
+        queue = self._queue
+        off_screen = self._off_screen
+        occupancy = self._grid._occupancy
+        distances[:] = self._blank
+        tail = 0
+        for coord in self._get_sources():
+            if not off_screen[coord] and distances[coord]:
+                distances[coord] = 0
+                moves[coord] = 0
+                queue[tail] = coord
+                tail += 1
+        head = 0
+        while head < tail:
+            coord = queue[head]
+            head += 1
+            distance = distances[coord] + 1
+            if distance == self.UNREACHABLE:
+                continue
+            move = 1
+            for delta in self._deltas:
+                neighbour = coord + delta
+                if (
+                    distances[neighbour] == self.UNREACHABLE and
+                    not off_screen[neighbour]
+                ):
+                    distances[neighbour] = distance
+                    moves[neighbour] = move
+                    # Occupied cells get a distance, so blocks standing
+                    # on them can read their step, but paths don't cross them
+                    if not occupancy[neighbour]:
+                        queue[tail] = neighbour
+                        tail += 1
+                move += 1
+        self._is_dirty = False
+
+    def _refresh(self):
+        if self._is_dirty:
+            self._build()
+
+    def _get_cell(self, agent: Coord | GameBlock):
+        if isinstance(agent, tuple):
+            return GridGeometry.from_screen(agent)
+        distances = self._distances
+        return min(agent._pos, key=lambda coord: distances[coord])
+
+    def distance(self, agent: Coord | GameBlock) -> Optional[int]:
+        self._refresh()
+        distance = self._distances[self._get_cell(agent)]
+        return None if distance == self.UNREACHABLE else distance
+
+    def next_move(self, agent: Coord | GameBlock) -> Optional[BlockShift]:
+        self._refresh()
+        coord = self._get_cell(agent)
+        if self._distances[coord] == self.UNREACHABLE:
+            return None
+        return self._MOVES[self._moves[coord]]
+
 N_BUTTONS = 10
 
 class GPButtons():
@@ -931,15 +2718,14 @@ class GPButtons():
 
 class GPPeriodicCallback():
     def __init__(self, repeat_every: int):
-        self._repeat_every = repeat_every
+        self._timer = Timer(self, repeat_every)
 
-    def _reset(self):
-        self._counter = 0
+    def _start(self, timers: TimerWheel):
+        # Runs on the frame the button is pressed, then periodically
+        timers.start(self._timer, 0)
 
-    def _run(self):
-        if self._counter % self._repeat_every == 0:
-            self()
-        self._counter += 1
+    def _stop(self):
+        self._timer.cancel()
 
     def __call__(self):
         raise NotImplementedError("You must overload this method")
@@ -947,15 +2733,26 @@ class GPPeriodicCallback():
 class Gamepad():
     def __init__(
         self,
+        label: str,
         on_press: dict[int, GPPeriodicCallback | Callable[[], Any]],
-        on_release: dict[int, Callable[[], Any]]
+        on_release: dict[int, Callable[[], Any]],
+        timers: TimerWheel
     ):
+        self._label = label
+        self._state = 0
         self._on_press = on_press
         self._on_release = on_release
+        self._timers = timers
         self._is_pressed = [False] * N_BUTTONS
-        self._periodic_callbacks: list[GPPeriodicCallback] = []
+        self._pending_states: list[int] = []
+        self._pending_ms: list[int] = []
+
+    def _push_state(self, state: int):
+        self._pending_states.append(state)
+        self._pending_ms.append(ticks_ms())
 
     def _update_state(self, state: int):
+        self._state = state
         for i in range(N_BUTTONS - 1, -1, -1):
             is_pressed = bool(state % 2) if state > 0 else False
             was_pressed = self._is_pressed[i]
@@ -964,8 +2761,7 @@ class Gamepad():
                 if not was_pressed and is_pressed:
                     callback = self._on_press[i]
                     if isinstance(callback, GPPeriodicCallback):
-                        callback._reset()
-                        self._periodic_callbacks.append(callback)
+                        callback._start(self._timers)
                     else:
                         callback()
                 elif not is_pressed and was_pressed:
@@ -975,15 +2771,11 @@ class Gamepad():
                         pass
                     press_callback = self._on_press[i]
                     if isinstance(press_callback, GPPeriodicCallback):
-                        self._periodic_callbacks.remove(press_callback)
+                        press_callback._stop()
             except KeyError:
                 pass
             state //= 2
 
-    def _run_periodic(self):
-        for callback in self._periodic_callbacks:
-            callback._run()
-
     def is_pressed(self, button: int):
         return self._is_pressed[button]
 
@@ -991,10 +2783,12 @@ class GPBuilder():
     def __init__(self):
         self._instances: dict[str, Gamepad] = {}
         self._info: dict[str, dict[str]] = {}
+        self._gamepads: list[Gamepad] = []
+        self._timers: Optional[TimerWheel] = None
 
     def _new_info_id(self):
         while True:
-            id = f"#{randint(0, maxsize)}"
+            id = f"#{int.from_bytes(urandom(4), 'big')}"
             if id not in self._info:
                 return id
 
@@ -1011,20 +2805,462 @@ class GPBuilder():
             "buttons": buttons,
             "isConnected": False
         }
-        return self._instances.setdefault(
+        gamepad = self._instances.setdefault(
             id,
             Gamepad(
+                label,
                 on_press or {},
-                on_release or {}
+                on_release or {},
+                self._timers
             )
         )
+        self._gamepads.append(gamepad)
+        return gamepad
     
-    def _run_all_periodic(self):
-        for instance in self._instances.values():
-            instance._run_periodic()
-    
+    def _wrap_callbacks(self, wraps: list['HookWrapper'], start: int=0):
+        # Only the gamepads built by the current engine, periodic
+        # callbacks are wrapped on their own timer, not their class
+        for gamepad in self._gamepads[start:]:
+            for hook, callbacks in (
+                ("on_press", gamepad._on_press),
+                ("on_release", gamepad._on_release)
+            ):
+                for button, callback in callbacks.items():
+                    if isinstance(callback, GPPeriodicCallback):
+                        timer = callback._timer
+                        for wrap in wraps:
+                            timer._callback = wrap(
+                                hook,
+                                gamepad._label,
+                                timer._callback
+                            )
+                        continue
+                    for wrap in wraps:
+                        callback = wrap(hook, gamepad._label, callback)
+                    callbacks[button] = callback
+
 GP_BUILDER = GPBuilder()
 
+type HookWrapper = Callable[[str, str, Callable], Callable]
+
+class HookStats():
+    def __init__(self, hook: str, owner: str):
+        self.hook = hook
+        self.owner = owner
+        self.calls = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def add(self, elapsed_us: int):
+        self.calls += 1
+        self.total_us += elapsed_us
+        if elapsed_us > self.max_us:
+            self.max_us = elapsed_us
+
+    def to_dict(self):
+        return {
+            "hook": self.hook,
+            "owner": self.owner,
+            "calls": self.calls,
+            "total_us": self.total_us,
+            "max_us": self.max_us
+        }
+
+class HookProfiler():
+    def __init__(self):
+        self._stats: list[HookStats] = []
+        self._named: dict[tuple[str, str], HookStats] = {}
+        self._frame = HookStats("frame", "")
+
+    def _timed(self, stats: HookStats, func: Callable):
+        def timed(*args, **kwargs):
+            start = ticks_us()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.add(ticks_diff(ticks_us(), start))
+        return timed
+
+    def wrap(self, hook: str, owner: str, func: Callable):
+        # Timers wrap their callback on every registration, repeats of
+        # one callback share its line
+        key = hook, owner
+        stats = self._named.get(key)
+        if stats is None:
+            stats = self._named[key] = HookStats(hook, owner)
+            self._stats.append(stats)
+        return self._timed(stats, func)
+
+    def wrap_frame(self, func: Callable):
+        return self._timed(self._frame, func)
+
+    def summary(self):
+        return {
+            "frames": self._frame.calls,
+            "frame_us": self._frame.total_us,
+            "hooks": [
+                stats.to_dict()
+                for stats in self._stats
+                if stats.calls
+            ]
+        }
+
+class SessionRecorder():
+    _MAGIC = b"PDRL"
+    _HEADER = "<4sIIIIIIH"
+    _INPUT = "<IBH"
+    _HASH = "<H"
+    _INPUT_SIZE = calcsize(_INPUT)
+
+    def __init__(self, session_seed: int, log_size: int, n_hashes: int):
+        self._seed = session_seed
+        self._inputs = bytearray(log_size)
+        self._inputs_len = 0
+        # Checkpoints of the hash chain every _hash_period frames, so
+        # each one checks all the frames before it
+        self._hashes = array("H", bytes(2 * n_hashes))
+        self._n_hashes = 0
+        self._hash_period = 1
+        self._chain = 0
+        self._last_hashed = 0
+        # Last frame whose inputs all fit in the log, -1 while none dropped
+        self._last_complete = -1
+
+    @staticmethod
+    def _chain_hash(chain: int, value: int):
+        return (chain * 31 + value + 1) & 0xFFFF
+
+    def record_input(self, frame: int, player: int, state: int):
+        if self._last_complete >= 0:
+            return
+        end = self._inputs_len + self._INPUT_SIZE
+        if end > len(self._inputs):
+            self._last_complete = frame - 1
+            return
+        pack_into(
+            self._INPUT,
+            self._inputs,
+            self._inputs_len,
+            frame,
+            player,
+            state
+        )
+        self._inputs_len = end
+
+    def record_hash(self, frame: int, value: int):
+        # Hashes past a dropped input couldn't be checked anyway
+        if 0 <= self._last_complete < frame:
+            return
+        self._chain = self._chain_hash(self._chain, value)
+        self._last_hashed = frame
+        hashes = self._hashes
+        if frame % self._hash_period or not hashes:
+            return
+        if self._n_hashes == len(hashes):
+            # Full, keep every other checkpoint and take them half as
+            # often, the whole session stays covered
+            for i in range(1, len(hashes), 2):
+                hashes[i >> 1] = hashes[i]
+            self._n_hashes = len(hashes) >> 1
+            self._hash_period <<= 1
+            if frame % self._hash_period:
+                return
+        hashes[self._n_hashes] = self._chain
+        self._n_hashes += 1
+
+    def _replayable(self, frames: int):
+        return frames if self._last_complete < 0 else self._last_complete
+
+    def summary(self, frames: int):
+        return {
+            "frames": frames,
+            "replayable": self._replayable(frames),
+            "checked": self._last_hashed,
+            "checkpoints": self._n_hashes + (
+                self._last_hashed > self._n_hashes * self._hash_period
+            )
+        }
+
+    def dump(self, frames: int):
+        n_hashes = self._n_hashes
+        header_size = calcsize(self._HEADER)
+        hashes_start = header_size + self._inputs_len
+        # The chain's current value closes the frames after the last
+        # checkpoint
+        data = bytearray(hashes_start + (n_hashes + 1) * 2)
+        pack_into(
+            self._HEADER,
+            data,
+            0,
+            self._MAGIC,
+            self._seed,
+            frames,
+            self._replayable(frames),
+            self._hash_period,
+            self._last_hashed,
+            self._inputs_len,
+            n_hashes
+        )
+        data[header_size:hashes_start] = self._inputs[:self._inputs_len]
+        for i in range(n_hashes):
+            pack_into(
+                self._HASH,
+                data,
+                hashes_start + i * 2,
+                self._hashes[i]
+            )
+        pack_into(self._HASH, data, hashes_start + n_hashes * 2, self._chain)
+        return b2a_base64(data).decode().strip()
+
+class FlightRecorder():
+    SPAWN = 0
+    DESTROY = 1
+    _MAGIC = b"PDFR"
+    _HEADER = "<4sHH"
+    _FRAME = "<IHHHBB"
+    _EVENT = "<IBB"
+    _FRAME_SIZE = calcsize(_FRAME)
+    _EVENT_SIZE = calcsize(_EVENT)
+
+    def __init__(self, n_frames: int, n_events: int):
+        self._n_frames = n_frames
+        self._n_events = n_events
+        self._frames = bytearray(n_frames * self._FRAME_SIZE)
+        self._events = bytearray(n_events * self._EVENT_SIZE)
+        self._frame_i = 0
+        self._event_i = 0
+        self._spawned = 0
+        self._destroyed = 0
+
+    def record_event(self, frame: int, kind: int, class_i: int):
+        pack_into(
+            self._EVENT,
+            self._events,
+            self._event_i % self._n_events * self._EVENT_SIZE,
+            frame,
+            kind,
+            class_i
+        )
+        self._event_i += 1
+        if kind == self.SPAWN:
+            self._spawned += 1
+        else:
+            self._destroyed += 1
+
+    def record_frame(
+        self,
+        frame: int,
+        frame_us: int,
+        first_state: int,
+        second_state: int
+    ):
+        pack_into(
+            self._FRAME,
+            self._frames,
+            self._frame_i % self._n_frames * self._FRAME_SIZE,
+            frame,
+            min(frame_us, 0xFFFF),
+            first_state,
+            second_state,
+            min(self._spawned, 0xFF),
+            min(self._destroyed, 0xFF)
+        )
+        self._frame_i += 1
+        self._spawned = 0
+        self._destroyed = 0
+
+    @staticmethod
+    def _copy_ring(
+        data: bytearray,
+        offset: int,
+        ring: bytearray,
+        size: int,
+        n_written: int,
+        n_records: int
+    ):
+        n_copied = min(n_written, n_records)
+        first = n_written - n_copied
+        for i in range(n_copied):
+            start = (first + i) % n_records * size
+            data[offset:offset + size] = ring[start:start + size]
+            offset += size
+        return n_copied
+
+    def dump(self):
+        n_frames = min(self._frame_i, self._n_frames)
+        n_events = min(self._event_i, self._n_events)
+        header_size = calcsize(self._HEADER)
+        frames_size = n_frames * self._FRAME_SIZE
+        data = bytearray(
+            header_size +
+            frames_size +
+            n_events * self._EVENT_SIZE
+        )
+        pack_into(self._HEADER, data, 0, self._MAGIC, n_frames, n_events)
+        self._copy_ring(
+            data,
+            header_size,
+            self._frames,
+            self._FRAME_SIZE,
+            self._frame_i,
+            self._n_frames
+        )
+        self._copy_ring(
+            data,
+            header_size + frames_size,
+            self._events,
+            self._EVENT_SIZE,
+            self._event_i,
+            self._n_events
+        )
+        return b2a_base64(data).decode().strip()
+
+class LatencyProbe():
+    # Buckets of _BUCKET_MS each, the last one takes everything slower
+    _BUCKET_MS = 10
+    _N_BUCKETS = 12
+
+    def __init__(self, gamepads: list[Gamepad], depth: int, capacity: int=32):
+        self._labels = [gamepad._label for gamepad in gamepads]
+        self._depth = depth
+        self._capacity = capacity
+        # Inputs waiting for the frame that shows them
+        self._players = bytearray(capacity)
+        self._due = array("I", bytes(4 * capacity))
+        self._stamps = array("I", bytes(4 * capacity))
+        self._head = 0
+        self._n = 0
+        self._dropped = 0
+        self._histograms = [
+            array("H", bytes(2 * self._N_BUCKETS))
+            for _ in gamepads
+        ]
+        self._total_ms = array("I", bytes(4 * len(gamepads)))
+        self._max_ms = array("I", bytes(4 * len(gamepads)))
+
+    def record_input(self, frame: int, player: int, stamp_ms: int):
+        if self._n == self._capacity:
+            self._dropped += 1
+            return
+        i = (self._head + self._n) % self._capacity
+        self._players[i] = player
+        self._due[i] = frame + self._depth
+        self._stamps[i] = stamp_ms
+        self._n += 1
+
+    def record_write(self, frame: int):
+        if not self._n:
+            return
+        now = ticks_ms()
+        capacity = self._capacity
+        last_bucket = self._N_BUCKETS - 1
+        while self._n and self._due[self._head] <= frame:
+            i = self._head
+            player = self._players[i]
+            latency = ticks_diff(now, self._stamps[i])
+            bucket = min(latency // self._BUCKET_MS, last_bucket)
+            self._histograms[player][bucket] += 1
+            self._total_ms[player] += latency
+            self._max_ms[player] = max(self._max_ms[player], latency)
+            self._head = (i + 1) % capacity
+            self._n -= 1
+
+    def summary(self):
+        return {
+            "bucket_ms": self._BUCKET_MS,
+            "dropped": self._dropped,
+            "players": [
+                {
+                    "label": label,
+                    "counts": list(histogram),
+                    "total_ms": self._total_ms[i],
+                    "max_ms": self._max_ms[i]
+                }
+                for i, (label, histogram) in enumerate(
+                    zip(self._labels, self._histograms)
+                )
+            ]
+        }
+
+class FrameWatchdog():
+    # A thread watches the frames instead of machine.WDT, which can't
+    # be stopped once armed and would reset the next project too
+    _POLL_MS = 100
+    _FRAME_MARKER = b"frame"
+
+    def __init__(self, budget_ms: int, timeout_ms: int):
+        self._budget_ms = budget_ms
+        self._timeout_ms = timeout_ms
+        self._used_ms = 0
+        self._hooks: list[bytes] = []
+        self._fed_ms = ticks_ms()
+        self._is_running = True
+        start_new_thread(self._watch, ())
+
+    @staticmethod
+    def check_reset():
+        # Only written right before a reset, so anything left is an overrun
+        rtc = RTC()
+        hook = rtc.memory()
+        if hook:
+            rtc.memory(b"")
+            raise FrameBudgetError(
+                f"Frame budget exceeded in {hook.decode()} "
+                "(the device was reset by the watchdog)"
+            )
+
+    def _watch(self):
+        while self._is_running:
+            sleep(self._POLL_MS / 1000)
+            if (
+                self._is_running and
+                ticks_diff(ticks_ms(), self._fed_ms) > self._timeout_ms
+            ):
+                hooks = self._hooks
+                RTC().memory(hooks and hooks[-1] or self._FRAME_MARKER)
+                reset()
+                return
+
+    def feed(self):
+        self._fed_ms = ticks_ms()
+
+    def stop(self):
+        self._is_running = False
+
+    def _enter(self, hook: bytes):
+        self._hooks.append(hook)
+
+    def _exit(self):
+        self._hooks.pop()
+
+    def wrap(self, hook: str, owner: str, func: Callable):
+        name = f"{owner}.{hook}"
+        marker = name.encode()
+
+        def guarded(*args, **kwargs):
+            self._enter(marker)
+            start = ticks_ms()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                self._exit()
+            if not self._hooks:
+                self._used_ms += ticks_diff(ticks_ms(), start)
+                if self._used_ms > self._budget_ms:
+                    raise FrameBudgetError(
+                        f"Frame budget exceeded in {name} "
+                        f"({self._used_ms} ms > {self._budget_ms} ms)"
+                    )
+            return result
+        return guarded
+
+    def wrap_frame(self, func: Callable):
+        def fed(*args, **kwargs):
+            self.feed()
+            self._used_ms = 0
+            return func(*args, **kwargs)
+        return fed
+
 class ContinueOuterIteration(Exception): ...
 
 class TransposeConflictError(ValuedException[GameBlock]): ...
@@ -1033,25 +3269,142 @@ type Collisions = dict[GameBlock, tuple[WallCorners | GameBlock, BlockMove]]
     
 class GameEngine():
     _move_types: list[type[BlockMoves]] = [BlockShift, BlockRotate]
+    _block_classes: tuple[type[GameBlock]] = ()
+    recording: bool = False
+    input_log_size: int = 4096
+    hash_history: int = 600
+    flight_frames: int = 180
+    flight_events: int = 64
+    profiling: bool = False
+    watchdog: bool = False
+    frame_budget_ms: int = 200
+    watchdog_timeout_ms: int = 5000
+    strict_allocation: bool = False
+    max_particles: int = 32
+    palette_mode: bool = False
+    gamma: float = 1.0
+    brightness: int = 255
+    max_current_ma: int = 0
+    threaded_output: bool = False
+    low_latency: bool = False
+    latency_probe: bool = False
+    adaptive_refresh: bool = False
+    max_idle_frames: int = ScreenInfo.REFRESH_RATE // 4
+    hud_font: Optional[BitmapFont] = None
     _BCE = BlockConflictError()
     _RBE = RevertedBlockError()
     _TCE = TransposeConflictError()
 
     # Order here matters...
     # (Don't touch if you don't know what you're doing)
-    def __init__(self, reporter: ErrorReporter):
+    def __init__(
+        self,
+        reporter: ErrorReporter,
+        session_seed: int | None=None
+    ):
+        if session_seed is None:
+            session_seed = getrandbits(30)
+        seed(session_seed)
         self._reporter = reporter
         self._loop = GameLoop()
-        self._renderer = ScreenRenderer()
+        self._renderer = ScreenRenderer(OutputStage(
+            ScreenInfo.WIDTH * ScreenInfo.HEIGHT,
+            self.gamma,
+            self.brightness,
+            self.max_current_ma
+        ))
+        if self.threaded_output:
+            self._renderer._start_writer()
+        self._timers = GP_BUILDER._timers = TimerWheel()
         self._animator = self._get_animator()
-        self._block_pool = BlockPool()
-        self._grid = GameGrid(self._renderer, self._block_pool)
-        self._collisions: Collisions = {}
+        # Above the grid and particles, below the error animations
+        self._hud = self.hud_font and self._renderer.new_text_layer(
+            self.hud_font,
+            self._timers
+        ) or None
+        self._particles = ParticleSystem(self._renderer, self.max_particles)
+        self._pool_guard = PoolGuard(self.strict_allocation)
+        self._block_pool = BlockPool(self._pool_guard)
+        self._reserve_pools()
+        self._palette = self.palette_mode and Palette() or None
+        self._grid = GameGrid(
+            self._renderer,
+            self._block_pool,
+            self._palette
+        )
+        self._grid._has_cell_colors = any(
+            any(block_cls._frame_colors)
+            for block_cls in self._block_classes
+        )
+        self._distance_fields: dict[Any, DistanceField] = {}
+        self._nth_periods: list[int] = []
+        self._n_nth_hits = 0
+        self._n_quiet = 0
+        self._n_skipped = 0
+        self._skipped = 0
+        self._collisions: Collisions = OrderedDict()
+        self._recorder = self.recording and SessionRecorder(
+            session_seed,
+            self.input_log_size,
+            self.hash_history
+        ) or None
+        self._flight = self.flight_frames and FlightRecorder(
+            self.flight_frames,
+            self.flight_events
+        ) or None
+        self._profiler = self.profiling and HookProfiler() or None
+        self._watchdog = self.watchdog and FrameWatchdog(
+            self.frame_budget_ms,
+            self.watchdog_timeout_ms
+        ) or None
+        # Hooks are dispatched through this engine's own tables, so
+        # wrapping them never touches the user's classes
+        self._spawn_hooks: dict[type[GameBlock], Callable] = {
+            block_cls: block_cls.on_spawn
+            for block_cls in self._block_classes
+        }
+        self._collision_handlers: dict[
+            type[GameBlock],
+            tuple[dict[type[GameBlock], Callable], tuple[Callable]]
+        ] = {
+            block_cls: (block_cls._block_handlers, block_cls._wall_handlers)
+            for block_cls in self._block_classes
+        }
+        self._wraps = wraps = [
+            wrapper.wrap
+            for wrapper in (self._profiler, self._watchdog)
+            if wrapper
+        ]
+        if wraps:
+            self._wrap_hooks(wraps)
+        for wrapper in (self._profiler, self._watchdog):
+            if wrapper:
+                self._run_iteration = wrapper.wrap_frame(self._run_iteration)
+        if self.low_latency:
+            self._run_frame = self._run_low_latency_frame
+        n_gamepads = len(GP_BUILDER._gamepads)
         self.on_init()
+        if wraps:
+            GP_BUILDER._wrap_callbacks(wraps, n_gamepads)
+        # Gamepads only exist once the game has built them
+        self._probe = self.latency_probe and LatencyProbe(
+            GP_BUILDER._gamepads,
+            0 if self.low_latency else 2
+        ) or None
+
+    def _reserve_pools(self):
+        n_blocks = 0
+        for block_cls in self._block_classes:
+            self._block_pool.reserve(block_cls, block_cls.max_instances)
+            n_blocks += block_cls.max_instances
+        BlockPos._reserve(self._pool_guard, n_blocks + 1)
+        WallCorners._reserve(
+            self._pool_guard,
+            n_blocks * len(self._move_types)
+        )
 
     def _get_animator(self):
         return Animator.new(
-            self._loop,
             self._renderer,
             BlinkingXOnError,
             BlockBlinker
@@ -1088,13 +3441,95 @@ class GameEngine():
         # Two separated for loops is intentional here
         for block_class in block_classes:
             block_class._process()
+        GridGeometry.configure(GameBlock._max_length)
         for block_class in block_classes:
             block_class._post_process()
+        engine_cls._block_classes = tuple(
+            sorted(block_classes, key=lambda c: c.__name__)
+        )
+        for i, block_class in enumerate(engine_cls._block_classes):
+            block_class._class_i = i
+            block_class._resolve_collisions(engine_cls._block_classes)
         return engine_cls
 
+    @staticmethod
+    def _wrap_all(
+        wraps: list[HookWrapper],
+        hook: str,
+        owner: str,
+        func: Callable
+    ):
+        for wrap in wraps:
+            func = wrap(hook, owner, func)
+        return func
+
+    def _wrap_hooks(self, wraps: list[HookWrapper]):
+        for block_cls in self._block_classes:
+            owner = block_cls.__name__
+            self._spawn_hooks[block_cls] = self._wrap_all(
+                wraps,
+                "on_spawn",
+                owner,
+                block_cls.on_spawn
+            )
+            wrapped: dict[Callable, Callable] = {}
+
+            def wrap_handler(handler: Callable):
+                if handler not in wrapped:
+                    wrapped[handler] = self._wrap_all(
+                        wraps,
+                        handler.__name__,
+                        owner,
+                        handler
+                    )
+                return wrapped[handler]
+
+            block_handlers, wall_handlers = self._collision_handlers[block_cls]
+            self._collision_handlers[block_cls] = (
+                {
+                    other_cls: wrap_handler(handler)
+                    for other_cls, handler in block_handlers.items()
+                },
+                tuple(wrap_handler(handler) for handler in wall_handlers)
+            )
+        owner = type(self).__name__
+        self.on_init = self._wrap_all(wraps, "on_init", owner, self.on_init)
+        self.on_iteration = self._wrap_all(
+            wraps,
+            "on_iteration",
+            owner,
+            self.on_iteration
+        )
+
+    def _collide(
+        self,
+        block: GameBlock,
+        other: WallCorners | GameBlock,
+        move: BlockMove
+    ):
+        block_handlers, wall_handlers = self._collision_handlers[type(block)]
+        if type(other) is WallCorners:
+            handler = wall_handlers[other._mask]
+        else:
+            handler = block_handlers[type(other)]
+        handler(block, other, self, move)
+
     def spawned_blocks(self):
         yield from self._block_pool
 
+    def blocks_of[C: GameBlock](self, block_cls: type[C]) -> Iterable[C]:
+        # Destroyed blocks stay in the pool until the end of the frame
+        for block in self._block_pool.of(block_cls):
+            if not block._is_deleted:
+                yield block
+
+    def count_of(self, block_cls: type[GameBlock]):
+        n_blocks = 0
+        for block in self._block_pool.of(block_cls):
+            if not block._is_deleted:
+                n_blocks += 1
+        return n_blocks
+
     def on_iteration(self): ...
 
     def on_init(self): ...
@@ -1103,24 +3538,40 @@ class GameEngine():
     def grid(self):
         return self._grid._view
 
+    @property
+    def particles(self):
+        return self._particles
+
+    @property
+    def palette(self):
+        return self._palette
+
+    @property
+    def hud(self):
+        return self._hud
+
+    def new_palette_layer(self, palette: Palette | None=None):
+        # Layers made here are drawn below the grid
+        return self._renderer.new_palette_layer(
+            palette or self._palette or Palette()
+        )
+
     def _abort_swap(self, block: GameBlock, shift: BlockShift):
         for coord in block._pos:
+            slot = self._grid[shift._simulate(coord)]
+            if not slot:
+                continue
             try:
-                coord_ = shift._simulate(coord)
-                block_ = self._grid[coord_].front
+                block_ = slot.front
                 if block_ is not block:
                     move_ = block_._get_move(BlockShift)
                     if move_._is_opposite(shift):
                         return block_, move_
-            except (
-                IndexError,
-                MissingBlockError,
-                MissingMoveError
-            ):
+            except MissingMoveError:
                 pass
 
     def _run_intention(self, move_type: type[BlockMove]):
-        for block in self._block_pool:
+        for block in self._block_pool.active():
             try:
                 move = block._get_move(move_type)
             except MissingMoveError:
@@ -1143,7 +3594,7 @@ class GameEngine():
     def _run_resolution(self, move_type: type[BlockMove]):
         moving_blocks = [
             block
-            for block in self._block_pool
+            for block in self._block_pool.active()
             if block._wants_to_move(move_type)
         ]
         still_moving_blocks: list[GameBlock] = []
@@ -1183,10 +3634,42 @@ class GameEngine():
             self._run_intention(move_type)
             self._run_resolution(move_type)
             for block, (other, move) in self._collisions.items():
-                block.on_collision(other, self, move)
+                self._collide(block, other, move)
         
+    def every(
+        self,
+        period: int,
+        callback: Callable[[], Any],
+        delay: Optional[int]=None
+    ):
+        return self._timers.every(
+            period,
+            self._wrap_timer("every", callback),
+            delay
+        )
+
+    def after(self, delay: int, callback: Callable[[], Any]):
+        return self._timers.after(delay, self._wrap_timer("after", callback))
+
+    def _wrap_timer(self, hook: str, callback: Callable[[], Any]):
+        if not self._wraps:
+            return callback
+        # MicroPython only names functions by __name__
+        owner = (
+            getattr(callback, "__qualname__", None) or
+            getattr(callback, "__name__", None) or
+            type(callback).__name__
+        )
+        return self._wrap_all(self._wraps, hook, owner, callback)
+
     def is_nth_iteration(self, value: int):
-        return self._loop.i % value == 0
+        # Adaptive refresh never skips a frame one of these lands on
+        if value not in self._nth_periods:
+            self._nth_periods.append(value)
+        if self._loop.i % value:
+            return False
+        self._n_nth_hits += 1
+        return True
     
     def spawn[C: GameBlock](
         self,
@@ -1201,14 +3684,81 @@ class GameEngine():
         angle: int | SpawnDirective=BlockAngles.DEG_0,
         **callback_params
     ) -> C:
-        if angle is SpawnDirectives.RANDOM:
-            angle = randint(0, 3)
-        elif not isinstance(angle, int):
-            raise NotImplementedError(
-                "Unknown angle's value "
-                f"or directive: {angle}"
+        ref, angle = self._resolve_spawn(block_cls, coord, angle)
+        return self._spawn(block_cls, ref, angle, callback_params)
+
+    def spawn_anywhere[C: GameBlock](
+        self,
+        block_cls: type[C],
+        region: Optional[tuple[int, int, int, int]]=None,
+        angle: int | SpawnDirective=BlockAngles.DEG_0,
+        **callback_params
+    ) -> C:
+        angles = (
+            range(4)
+            if angle is SpawnDirectives.RANDOM else
+            (self._resolve_angle(angle),)
+        )
+        rect = GridGeometry.clip(
+            region or (0, 0, ScreenInfo.WIDTH, ScreenInfo.HEIGHT)
+        )
+        place = (
+            self._grid._pick_place(block_cls, angles, rect)
+            if rect else
+            -1
+        )
+        if place < 0:
+            raise SpawnError(
+                f"There's no free place to spawn {block_cls.__name__}"
+            )
+        return self._spawn(block_cls, place >> 2, place & 3, callback_params)
+
+    def _spawn[C: GameBlock](
+        self,
+        block_cls: type[C],
+        ref: int,
+        angle: int,
+        callback_params: dict[str, Any]
+    ) -> C:
+        with BlockPos._enable_cache():
+            pos = BlockPos._get_cached()
+            pos.__init__(
+                ref,
+                block_cls._offsets,
+                block_cls._cells,
+                angle,
+                block_cls._colors
             )
-        angle %= 4
+            slots = [self._grid._get_slot(coord, block_cls) for coord in pos]
+            clashing_blocks: set[GridSlot] = set(chain_from_iterable(slots))
+            if clashing_blocks:
+                self._BCE.set_and_raise(clashing_blocks)
+            block = self._block_pool.new(block_cls)
+            block._pos.copy(pos)
+            block._frame_i = 0
+            self._record_flight_event(FlightRecorder.SPAWN, block)
+            self._spawn_hooks[block_cls](block, **callback_params)
+            for slot in slots:
+                slot.add(block)
+            return block
+
+    def _resolve_spawn(
+        self,
+        block_cls: type[GameBlock],
+        coord: Union[
+            Coord,
+            tuple[
+                Union[int, SpawnDirective],
+                Union[int, SpawnDirective]
+            ]
+        ],
+        angle: int | SpawnDirective
+    ):
+        angle = (
+            randint(0, 3)
+            if angle is SpawnDirectives.RANDOM else
+            self._resolve_angle(angle)
+        )
         if isinstance(coord, tuple):
             c_values: list[int] = []
             for i, value in enumerate(coord):
@@ -1224,35 +3774,212 @@ class GameEngine():
                     )
                 c_values.append(c_value + block_cls._boundings[i])
             coord = c_values
-        with BlockPos._enable_cache():
-            pos = BlockPos._get_cached()
-            pos.__init__(coord, block_cls._offsets, angle)
-            slots = [self._grid._get_slot(coord, block_cls) for coord in pos]
-            clashing_blocks: set[GridSlot] = set(chain_from_iterable(slots))
-            if clashing_blocks:
-                self._BCE.set_and_raise(clashing_blocks)
-            block = self._block_pool.new(block_cls)
-            block._pos.copy(pos)
-            block.on_spawn(**callback_params)
-            for slot in slots:
-                slot.add(block)
-            return block
+        return GridGeometry.pack(coord), angle
+
+    def _resolve_angle(self, angle: int | SpawnDirective):
+        if not isinstance(angle, int):
+            raise NotImplementedError(
+                "Unknown angle's value "
+                f"or directive: {angle}"
+            )
+        return angle % 4
 
     def destroy_block(self, block: GameBlock, animate: bool=True):
         if self._block_pool.delete(block):
+            self._record_flight_event(FlightRecorder.DESTROY, block)
             self._grid._erase(block)
             if animate:
                 blinker = self._animator.get(BlockBlinker)
                 for coord in block._pos:
                     blinker.add_coordinate(coord)
 
+    def full_rows(self):
+        return self._grid._full_rows()
+
+    def clear_rows(self, rows: Iterable[int], animate: bool=True):
+        # Every row at once, so each block loses all its cells in one go
+        blinker = animate and self._animator.get(BlockBlinker) or None
+        for block, coords in self._grid._collect_rows(rows).items():
+            for coord in coords:
+                self._grid[coord].remove(block)
+                if blinker:
+                    blinker.add_coordinate(coord)
+            block._pos.remove_all(coords)
+            if (
+                not block._pos.has_cells() and
+                self._block_pool.delete(block)
+            ):
+                self._record_flight_event(FlightRecorder.DESTROY, block)
+
+    def _shift_cells(
+        self,
+        shifts: list[tuple[GameBlock, list[int], int]],
+        region: tuple[int, int, int, int]
+    ):
+        # Cells only move vertically, so a destination stays
+        # inside the region while it stays within its rows
+        region_start, region_end, _, _ = region
+        slots = self._grid._slots
+        for block, coords, delta in shifts:
+            bounds_mask = block._bounds_mask
+            for coord in coords:
+                dest = coord + delta
+                if (
+                    not 0 <= dest < GridGeometry.SIZE or
+                    bounds_mask[dest] or
+                    slots.get(dest) and
+                    not region_start <= dest < region_end
+                ):
+                    self._TCE.set_and_raise(block)
+        for block, coords, _ in shifts:
+            for coord in coords:
+                self._grid[coord].remove(block)
+        for block, coords, delta in shifts:
+            for coord in coords:
+                # In bounds, so this only creates a slot that's missing
+                self._grid._get_slot(coord + delta, block).add(block)
+            block._pos.shift_cells(coords, delta)
+            block.wake()
+
+    def shift_region(self, rect: tuple[int, int, int, int], dy: int):
+        region = GridGeometry.get_region(rect)
+        delta = dy * GridGeometry.STRIDE
+        self._shift_cells(
+            [
+                (block, coords, delta)
+                for block, coords in self._grid._collect_region(region).items()
+            ],
+            region
+        )
+
+    def collapse_rows(self, rows: Iterable[int]):
+        # Everything above the lowest row falls in one pass, each band
+        # between the rows by how many of them are below it
+        rows = sorted(rows)
+        if not rows:
+            return
+        stride = GridGeometry.STRIDE
+        top = -GridGeometry.BORDER - GridGeometry.MARGIN
+        region = GridGeometry.get_region(
+            (0, top, ScreenInfo.WIDTH, rows[-1] - top)
+        )
+        cleared = [
+            GridGeometry.from_screen((0, row)) // stride
+            for row in rows
+        ]
+        drops = bytearray(cleared[-1])
+        n_below = 1
+        for y in range(cleared[-1] - 1, -1, -1):
+            if y in cleared:
+                n_below += 1
+            else:
+                drops[y] = n_below
+        shifts = []
+        for block, coords in self._grid._collect_region(region).items():
+            drop = drops[coords[0] // stride]
+            for coord in coords:
+                if drops[coord // stride] != drop:
+                    break
+            else:
+                shifts.append((block, coords, drop * stride))
+                continue
+            bands: dict[int, list[int]] = {}
+            for coord in coords:
+                drop = drops[coord // stride]
+                try:
+                    bands[drop].append(coord)
+                except KeyError:
+                    bands[drop] = [coord]
+            # Lower bands first, cells moved down can't land on the
+            # coordinates of a band still to move
+            for drop in sorted(bands):
+                shifts.append((block, bands[drop], drop * stride))
+        self._shift_cells(shifts, region)
+
+    def distance_field(self, target: Coord | type[GameBlock]):
+        try:
+            return self._distance_fields[target]
+        except KeyError:
+            pass
+        field = DistanceField(self._grid, target)
+        self._grid._fields.append(field)
+        self._distance_fields[target] = field
+        return field
+
+    def blocks_in_rect(self, rect: tuple[int, int, int, int]):
+        rect = GridGeometry.clip(rect)
+        if rect is None:
+            return []
+        return self._grid._blocks_in_region(GridGeometry.get_region(rect))
+
+    def is_area_free(
+        self,
+        block_cls: type[GameBlock],
+        coord: Union[
+            Coord,
+            tuple[
+                Union[int, SpawnDirective],
+                Union[int, SpawnDirective]
+            ]
+        ],
+        angle: int | SpawnDirective=BlockAngles.DEG_0
+    ):
+        ref, angle = self._resolve_spawn(block_cls, coord, angle)
+        return self._grid._is_area_free(block_cls, ref, angle)
+
+    def nearest[C: GameBlock](
+        self,
+        block_cls: type[C],
+        coord: Coord
+    ) -> Optional[C]:
+        stride = GridGeometry.STRIDE
+        target_y, target_x = divmod(GridGeometry.from_screen(coord), stride)
+        nearest_block = None
+        nearest_distance = -1
+        for block in self._block_pool.of(block_cls):
+            if block._is_deleted:
+                continue
+            for cell in block._pos:
+                y, x = divmod(cell, stride)
+                distance = (x - target_x) ** 2 + (y - target_y) ** 2
+                if nearest_distance < 0 or distance < nearest_distance:
+                    nearest_block = block
+                    nearest_distance = distance
+        return nearest_block
+
+    def raycast(
+        self,
+        coord: Coord,
+        direction: BlockShift
+    ) -> Optional[GameBlock]:
+        steps = max(ScreenInfo.WIDTH, ScreenInfo.HEIGHT)
+        for value, shift, size in zip(
+            coord,
+            direction._shift,
+            (ScreenInfo.WIDTH, ScreenInfo.HEIGHT)
+        ):
+            if not 0 <= value < size:
+                return None
+            if shift > 0:
+                steps = min(steps, (size - 1 - value) // shift)
+            elif shift < 0:
+                steps = min(steps, value // -shift)
+        return self._grid._raycast(
+            GridGeometry.from_screen(coord),
+            direction._delta,
+            steps
+        )
+
     def destroy_cell(self, slot: GridSlot, animate: bool=True):
         for block in slot.flush():
             if animate:
                 self._animator.get(BlockBlinker).add_coordinate(slot._coord)
             block._pos.remove(slot._coord)
-            if not block._pos.has_cells():
+            if (
+                not block._pos.has_cells() and
                 self._block_pool.delete(block)
+            ):
+                self._record_flight_event(FlightRecorder.DESTROY, block)
 
     @contextmanager
     def _report_error(self):
@@ -1262,20 +3989,195 @@ class GameEngine():
             if isinstance(e, KeyboardInterrupt):
                 raise
             self._activate_error_animation()
-            self._reporter.report_error(e)
+            self._reporter.report_error(e, self._get_error_report())
+
+    def _get_error_report(self):
+        report = {}
+        if self._recorder:
+            report["replay"] = self._recorder.dump(self._loop.i)
+            report["recording"] = self._recorder.summary(self._loop.i)
+        if self._flight:
+            report["flight"] = {
+                "data": self._flight.dump(),
+                "block_classes": [
+                    block_cls.__name__
+                    for block_cls in self._block_classes
+                ],
+                "players": [
+                    gamepad._label
+                    for gamepad in GP_BUILDER._gamepads
+                ]
+            }
+        return report
+
+    def _record_flight_event(self, kind: int, block: GameBlock):
+        if self._flight:
+            self._flight.record_event(self._loop.i, kind, block._class_i)
+
+    def _record_flight_frame(self, start_us: int):
+        gamepads = GP_BUILDER._gamepads
+        n_gamepads = len(gamepads)
+        self._flight.record_frame(
+            self._loop.i,
+            ticks_diff(ticks_us(), start_us),
+            n_gamepads > 0 and gamepads[0]._state or 0,
+            n_gamepads > 1 and gamepads[1]._state or 0
+        )
+
+    def _get_state_hash(self):
+        value = 0
+        for block in self._block_pool:
+            pos = block._pos
+            cell = (
+                pos.ref +
+                pos.ort_i % 4 * 1031 +
+                len(pos.offs) * 4099 +
+                block._class_i * 12289
+            ) & 0xFFFFF
+            value = (value + cell * 997) & 0xFFFF
+        return value
+
+    def _drain_inputs(self):
+        frame = self._loop.i
+        for i, gamepad in enumerate(GP_BUILDER._gamepads):
+            states = gamepad._pending_states
+            stamps = gamepad._pending_ms
+            try:
+                for state, stamp_ms in zip(states, stamps):
+                    if self._recorder:
+                        self._recorder.record_input(frame, i, state)
+                    if self._probe:
+                        self._probe.record_input(frame, i, stamp_ms)
+                    gamepad._update_state(state)
+            finally:
+                states.clear()
+                stamps.clear()
+
+    def _render(self):
+        self._renderer.render()
+        if self._probe:
+            self._probe.record_write(self._loop.i)
+
+    def _draw(self):
+        self._grid._draw()
+        self._particles.run()
+
+    def _simulate(self):
+        self._block_pool.flush()
+        self._block_pool.settle()
+        self._timers._advance()
+        with WallCorners._enable_cache():
+            self.on_iteration()
+            self._run_intention_resolution()
+
+    def _run_frame(self):
+        # Shows what the previous frame drew, from the simulation
+        # before it, so input reaches the strip two frames later
+        self._drain_inputs()
+        self._render()
+        if self._animator.run():
+            # Particles keep moving over a playing animation
+            self._particles.run()
+            return
+        self._draw()
+        self._simulate()
+
+    def _run_low_latency_frame(self):
+        # Input drained here reaches the strip by the end of the frame
+        self._drain_inputs()
+        if not self._animator.run():
+            self._simulate()
+            # Animations started now play over what was on screen
+            if not self._animator._active:
+                self._grid._draw()
+        self._particles.run()
+        self._render()
+
+    def _record_frame(self, start_us: int):
+        if self._recorder:
+            self._recorder.record_hash(self._loop.i, self._get_state_hash())
+        if self._flight:
+            self._record_flight_frame(start_us)
+
+    def _run_iteration(self):
+        with self._report_error():
+            start_us = ticks_us()
+            try:
+                self._run_frame()
+            finally:
+                self._record_frame(start_us)
+                self._pool_guard.seal()
+
+    def _has_pending_input(self):
+        for gamepad in GP_BUILDER._gamepads:
+            if gamepad._pending_states:
+                return True
+        return False
+
+    def _count_changes(self):
+        # Timer callbacks and game logic behind is_nth_iteration can
+        # recolor blocks, edit palettes or draw on layers of their own,
+        # none of which the grid sees
+        n_changes = (
+            GridSlot._n_changes +
+            self._timers._fired +
+            self._n_nth_hits
+        )
+        if self._hud:
+            n_changes += self._hud._n_changes
+        return n_changes
+
+    def _is_quiet(self, n_changes: int, had_input: bool):
+        return (
+            not had_input and
+            self._count_changes() == n_changes and
+            not self._animator._active and
+            not self._particles._n and
+            not self._particles._n_drawn and
+            not self._block_pool._to_add and
+            not self._block_pool._to_remove
+        )
+
+    def _can_skip(self):
+        # The default order still has two frames to show after a change
+        depth = 0 if self.low_latency else 2
+        if self._n_quiet <= depth or self._n_skipped >= self.max_idle_frames:
+            return False
+        i = self._loop.i
+        for period in self._nth_periods:
+            if i % period == 0:
+                return False
+        return not self._timers._is_due() and not self._has_pending_input()
+
+    def _skip_frame(self):
+        # Keeps logical time only, nothing would be simulated or drawn
+        start_us = ticks_us()
+        self._n_skipped += 1
+        self._skipped += 1
+        self._animator.run()
+        self._block_pool.settle()
+        self._timers._advance()
+        self._record_frame(start_us)
+
+    def _tick(self):
+        if not self.adaptive_refresh:
+            self._run_iteration()
+            return
+        if self._can_skip():
+            self._skip_frame()
+            return
+        self._n_skipped = 0
+        n_changes = self._count_changes()
+        had_input = self._has_pending_input()
+        self._run_iteration()
+        if self._is_quiet(n_changes, had_input):
+            self._n_quiet += 1
+        else:
+            self._n_quiet = 0
 
     async def _run_loop(self):
         async for _ in self._loop:
-            with self._report_error(), \
-                self._animator as run_animations:
-                self._renderer.render()
-                run_animations()
-                self._grid._draw()
-                self._block_pool.flush()
-                GP_BUILDER._run_all_periodic()
-                with WallCorners._enable_cache():
-                    self.on_iteration()
-                    self._run_intention_resolution()
+            self._tick()
 
     @contextmanager
     def noclip_enabled(self):
@@ -1306,7 +4208,7 @@ class GameEngine():
         ] = {}
         with BlockPos._enable_cache():
             yield move
-            dest_coords = set[Coord]()
+            dest_coords = set[int]()
             for block, (
                 dest_pos,
                 src_dest_slots,
@@ -1317,7 +4219,9 @@ class GameEngine():
                     src_coord,
                     dest_coord
                 ) in enumerate(zip(block._pos, dest_pos)):
-                    if filter_coords and not filter_coords(src_coord):
+                    if filter_coords and not filter_coords(
+                        GridGeometry.unpack(src_coord)
+                    ):
                         offset = dest_pos.to_offset(src_coord)
                         if offset in dest_pos.offs:
                             raise TransposeConflictError
@@ -1345,16 +4249,42 @@ class GameEngine():
                     src_slot.remove(block)
                     dest_slot.add(block)
                 if filtered_offsets:
-                    dest_pos.offs = tuple(
+                    dest_pos.set_offsets(tuple(
                         filtered_offsets.get(i) or off_
                         for i, off_ in enumerate(dest_pos.offs)
-                    )
+                    ))
                 block._pos.copy(dest_pos)
+                block.wake()
 
     async def __aenter__(self):
         self._heartbeat = create_task(self._run_loop())
         return self
 
+    def _get_session_report(self):
+        report = {}
+        if self._profiler:
+            report["profile"] = self._profiler.summary()
+        if self._recorder:
+            report["replay"] = self._recorder.dump(self._loop.i)
+            report["recording"] = self._recorder.summary(self._loop.i)
+        if self._profiler:
+            report["timers"] = self._timers.summary()
+            report["output"] = self._renderer._output.summary()
+        if self._probe:
+            report["latency"] = self._probe.summary()
+        if self._profiler and self.adaptive_refresh:
+            report["idle"] = {"frames": self._loop.i, "skipped": self._skipped}
+        if self.profiling or self.strict_allocation:
+            report["pools"] = self._pool_guard.summary()
+            report["grid"] = self._grid.footprint()
+        return report
+
     async def __aexit__(self, *_):
         self._loop.stop()
         await self._heartbeat
+        if self._watchdog:
+            self._watchdog.stop()
+        self._renderer._stop_writer()
+        report = self._get_session_report()
+        if report:
+            self._reporter.report_session(report)
@@ -1,40 +1,53 @@
 from urandom import *
+from urandom import getrandbits as _getrandbits32
 
-_getrandbits32 = getrandbits
+# Bits drawn for each small range, instead of counting them per call
+_SMALL_RANGE = 256
+_WIDTHS = bytes(
+    len(bin(n - 1)) - 2 if n > 1 else 0
+    for n in range(_SMALL_RANGE + 1)
+)
+
+def getrandbits(bits: int) -> int:
+    if 0 < bits <= 32:
+        return _getrandbits32(bits)
+    value = 0
+    shift = 0
+    while bits > 32:
+        value |= _getrandbits32(32) << shift
+        shift += 32
+        bits -= 32
+    if bits > 0:
+        value |= _getrandbits32(bits) << shift
+    return value
+
+def _randbelow(upper: int):
+    if upper <= 0:
+        raise ValueError("empty range")
+    if upper <= _SMALL_RANGE:
+        bits = _WIDTHS[upper]
+        if not bits:
+            return 0
+        while True:
+            r = _getrandbits32(bits)
+            if r < upper:
+                return r
+    bits = len(bin(upper - 1)) - 2
+    while True:
+        r = getrandbits(bits)
+        if r < upper:
+            return r
 
 def randrange(start, stop=None):
     if stop is None:
         stop = start
         start = 0
-    upper = stop - start
-    bits = 0
-    pwr2 = 1
-    while upper > pwr2:
-        pwr2 <<= 1
-        bits += 1
-    while True:
-        r = getrandbits(bits)
-        if r < upper:
-            break
-    return r + start
+    return _randbelow(stop - start) + start
+
+def randint(start, stop):
+    return randrange(start, stop + 1)
 
 def shuffle(seq):
-    l = len(seq)
-    for i in range(l):
-        j = randrange(l)
+    for i in range(len(seq) - 1, 0, -1):
+        j = _randbelow(i + 1)
         seq[i], seq[j] = seq[j], seq[i]
-
-def getrandbits(bits: int) -> int:
-    n = bits // 32
-    d = 0
-    for i in range(n):
-        d |= _getrandbits32(32) << (i * 32)
-
-    r = bits % 32
-    if r >= 1:
-        d |= _getrandbits32(r) << (n * 32)
-
-    return d
-
-def randint(start, stop):
-    return randrange(start, stop + 1)
\ No newline at end of file
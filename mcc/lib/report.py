@@ -10,27 +10,33 @@ class ErrorReporter():
         self._project_id = project_id
         self._report_task: Task | None = None
 
-    def report_error(self, exc: Exception):
+    def report_error(self, exc: Exception, extra: dict | None=None):
         try:
             raise exc
         except Exception as e:
             with StringIO() as f:
                 print_exception(e, f)
-                self._do_request(f.getvalue())
+                data = {"error_trace": f.getvalue()}
+        if extra:
+            data.update(extra)
+        self._do_request("report", data)
 
-    async def _request(self, trace: str):
+    def report_session(self, session: dict):
+        self._do_request("session", session)
+
+    async def _request(self, path: str, data: dict):
         async with self._http.post(
-            f"/project/report/{self._project_id}",
-            json={"error_trace": trace}
+            f"/project/{path}/{self._project_id}",
+            json=data
         ) as resp:
             await resp.text()
 
-    def _do_request(self, trace: str):
-        self._report_task = create_task(self._request(trace))
+    def _do_request(self, path: str, data: dict):
+        self._report_task = create_task(self._request(path, data))
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, *_):
         if self._report_task:
-            await self._report_task
\ No newline at end of file
+            await self._report_task
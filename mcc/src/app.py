@@ -7,6 +7,7 @@ from microdot.websocket import WebSocketError
 from aiohttp import ClientSession
 from playduino import GameEngine
 from playduino import GP_BUILDER
+from playduino import FrameWatchdog
 from asyncio import sleep_ms
 from wifi import get_ip_address
 from report import ErrorReporter
@@ -73,7 +74,7 @@ async def connect_gamepad(_, ws: WebSocket):
         gamepad = GP_BUILDER._instances[id]
         while not is_shutting_down:
             state = await ws.receive()
-            gamepad._update_state(int(state))
+            gamepad._push_state(int(state))
     except KeyError:
         await ws.send("Invalid player ID")
     except ValueError:
@@ -100,6 +101,7 @@ async def upload_project(request: Request, project_id: str):
 
 def get_engine(reporter: ErrorReporter):
     try:
+        FrameWatchdog.check_reset()
         import game
         return GameEngine._get_implementation(game)(reporter)
     except Exception as e:
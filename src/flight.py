@@ -0,0 +1,108 @@
+from struct import unpack_from
+from struct import calcsize
+from struct import iter_unpack
+from binascii import a2b_base64
+from collections import defaultdict
+
+# Mirrors FlightRecorder's layout in mcc/lib/playduino.py
+FLIGHT_MAGIC = b"PDFR"
+FLIGHT_HEADER = "<4sHH"
+FLIGHT_FRAME = "<IHHHBB"
+FLIGHT_EVENT = "<IBB"
+FLIGHT_SPAWN = 0
+BUTTON_NAMES = ("↑", "↓", "→", "←", "↖", "↗", "↙", "↘", "A", "B")
+
+QUIET_FRAMES_LINE = "#{}-#{} · {} frames sem eventos · {:.1f} ms/frame"
+FRAME_LINE = "#{} · {:.1f} ms · {}"
+RELEASED_LABEL = "solto"
+
+def format_buttons(state: int):
+    n_buttons = len(BUTTON_NAMES)
+    return " ".join(
+        name
+        for i, name in enumerate(BUTTON_NAMES)
+        if state >> (n_buttons - 1 - i) & 1
+    ) or RELEASED_LABEL
+
+class FlightTimeline():
+    def __init__(
+        self,
+        data: bytes,
+        block_classes: list[str],
+        players: list[str]
+    ):
+        magic, n_frames, n_events = unpack_from(FLIGHT_HEADER, data)
+        if magic != FLIGHT_MAGIC:
+            raise ValueError("Invalid flight recorder data")
+        frames_start = calcsize(FLIGHT_HEADER)
+        events_start = frames_start + n_frames * calcsize(FLIGHT_FRAME)
+        events_end = events_start + n_events * calcsize(FLIGHT_EVENT)
+        self._frames = list(
+            iter_unpack(FLIGHT_FRAME, data[frames_start:events_start])
+        )
+        self._events = defaultdict[int, list[str]](list)
+        for frame, kind, class_i in iter_unpack(
+            FLIGHT_EVENT,
+            data[events_start:events_end]
+        ):
+            name = (
+                block_classes[class_i]
+                if class_i < len(block_classes) else
+                f"#{class_i}"
+            )
+            sign = "+" if kind == FLIGHT_SPAWN else "-"
+            self._events[frame].append(sign + name)
+        self._players = players
+
+    @classmethod
+    def from_base64(
+        cls,
+        encoded: str,
+        block_classes: list[str],
+        players: list[str]
+    ):
+        return cls(a2b_base64(encoded), block_classes, players)
+
+    def _describe(self, frame: int, states: tuple[int, int], last_states):
+        changes = [
+            f"{player}: {format_buttons(state)}"
+            for player, state, last_state in zip(
+                self._players,
+                states,
+                last_states
+            )
+            if state != last_state
+        ]
+        return changes + self._events.get(frame, [])
+
+    def lines(self):
+        quiet: list[tuple[int, int]] = []
+
+        def flush_quiet():
+            if quiet:
+                yield QUIET_FRAMES_LINE.format(
+                    quiet[0][0],
+                    quiet[-1][0],
+                    len(quiet),
+                    sum(us for _, us in quiet) / len(quiet) / 1000
+                )
+                quiet.clear()
+
+        last_states = (0, 0)
+        for frame, frame_us, *states, _, _ in self._frames:
+            states = tuple(states)
+            description = self._describe(frame, states, last_states)
+            last_states = states
+            if not description:
+                quiet.append((frame, frame_us))
+                continue
+            yield from flush_quiet()
+            yield FRAME_LINE.format(
+                frame,
+                frame_us / 1000,
+                ", ".join(description)
+            )
+        yield from flush_quiet()
+
+    def format(self):
+        return "\n".join(self.lines())
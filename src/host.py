@@ -0,0 +1,257 @@
+from .path import MCC_ROOT
+from importlib.util import spec_from_file_location
+from importlib.util import module_from_spec
+from contextlib import contextmanager
+from traceback import format_exception
+from types import ModuleType
+from time import perf_counter_ns
+from time import sleep
+from os.path import join
+from os import urandom
+from typing import Any
+import asyncio
+import sys
+import gc
+# Loaded before the MicroPython modules are emulated,
+# so they keep CPython's own dependencies
+import array
+import binascii
+import collections
+import struct
+
+MCC_LIB = join(MCC_ROOT, "lib")
+LIB_MODULES = (
+    "itertools",
+    "operator",
+    "contextlib",
+    "random",
+    "neopixel",
+    "display",
+    "playduino"
+)
+_START_NS = perf_counter_ns()
+
+def ticks_us():
+    return (perf_counter_ns() - _START_NS) // 1000
+
+def ticks_ms():
+    return (perf_counter_ns() - _START_NS) // 1000000
+
+def ticks_diff(a: int, b: int):
+    return a - b
+
+def ticks_add(a: int, b: int):
+    return a + b
+
+async def sleep_ms(ms: int):
+    await asyncio.sleep(ms / 1000)
+
+class HostPin():
+    OUT = 1
+
+    def __init__(self, *_): ...
+
+    def init(self, *_): ...
+
+class HostRTC():
+    _memory = b""
+
+    def memory(self, data: bytes | None=None):
+        if data is None:
+            return HostRTC._memory
+        HostRTC._memory = bytes(data)
+
+class HostURandom():
+    # MicroPython's Yasmarang generator, as in extmod/modrandom.c,
+    # so seeded sessions draw the same numbers as on the device
+    _MASK32 = 0xFFFFFFFF
+
+    def __init__(self):
+        self.seed(0xEDA4BABA)
+
+    def seed(self, n: int | None=None):
+        if n is None:
+            n = int.from_bytes(urandom(4), "little")
+        self._pad = n & self._MASK32
+        self._n = 69
+        self._d = 233
+        self._dat = 0
+
+    def _next(self):
+        mask = self._MASK32
+        pad = self._pad + self._dat + self._d * self._n & mask
+        pad = (pad << 3 | pad >> 29) & mask
+        self._pad = pad
+        self._n = pad | 2
+        self._d ^= (pad << 31 & mask) + (pad >> 1) & mask
+        self._dat ^= (pad ^ self._d >> 8 ^ 1) & 0xFF
+        return (pad ^ self._d << 5 ^ pad >> 18 ^ self._dat << 1) & mask
+
+    def _randbelow(self, n: int):
+        mask = 1
+        while n & mask < n:
+            mask = mask << 1 | 1
+        while True:
+            r = self._next() & mask
+            if r < n:
+                return r
+
+    def getrandbits(self, n: int):
+        if not 0 <= n <= 32:
+            raise ValueError("bits must be 32 or less")
+        if not n:
+            return 0
+        return self._next() & self._MASK32 >> (32 - n)
+
+    def randrange(self, start: int, stop: int | None=None, step: int=1):
+        if stop is None:
+            start, stop = 0, start
+        if step > 0:
+            n = (stop - start + step - 1) // step
+        elif step < 0:
+            n = (stop - start + step + 1) // step
+        else:
+            n = 0
+        if n <= 0:
+            raise ValueError("empty range for randrange")
+        return start + step * self._randbelow(n)
+
+    def randint(self, a: int, b: int):
+        if a > b:
+            raise ValueError("empty range for randint")
+        return a + self._randbelow(b - a + 1)
+
+    def choice(self, seq: Any):
+        if not seq:
+            raise IndexError("empty sequence")
+        return seq[self._randbelow(len(seq))]
+
+    def random(self):
+        # Single precision on the device, 23 bits of mantissa
+        return (self._next() & 0x7FFFFF) / 0x800000
+
+    def uniform(self, a: float, b: float):
+        return a + (b - a) * self.random()
+
+class HostReporter():
+    def __init__(self, *_):
+        self.errors: list[Exception] = []
+        self.sessions: list[dict] = []
+
+    def report_error(self, exc: Exception, extra: dict | None=None):
+        self.errors.append(exc)
+
+    def report_session(self, session: dict):
+        self.sessions.append(session)
+
+    def format_errors(self):
+        return "\n".join(
+            "".join(format_exception(exc))
+            for exc in self.errors
+        )
+
+def _new_module(name: str, **attrs: Any):
+    module = ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+def _emulated_modules():
+    generator = HostURandom()
+    return {
+        "urandom": _new_module(
+            "urandom",
+            seed=generator.seed,
+            getrandbits=generator.getrandbits,
+            randrange=generator.randrange,
+            randint=generator.randint,
+            choice=generator.choice,
+            random=generator.random,
+            uniform=generator.uniform
+        ),
+        "machine": _new_module(
+            "machine",
+            Pin=HostPin,
+            RTC=HostRTC,
+            bitstream=lambda *_: None,
+            reset=lambda: None
+        ),
+        "time": _new_module(
+            "time",
+            ticks_ms=ticks_ms,
+            ticks_us=ticks_us,
+            ticks_diff=ticks_diff,
+            ticks_add=ticks_add,
+            sleep=sleep
+        ),
+        "asyncio": _new_module(
+            "asyncio",
+            create_task=asyncio.create_task,
+            Event=asyncio.Event,
+            sleep_ms=sleep_ms
+        ),
+        "gc": _new_module(
+            "gc",
+            collect=gc.collect,
+            mem_free=lambda: 0,
+            mem_alloc=lambda: 0
+        ),
+        "report": _new_module("report", ErrorReporter=HostReporter)
+    }
+
+@contextmanager
+def emulated_modules():
+    emulated = _emulated_modules()
+    names = [*emulated, *LIB_MODULES, "game"]
+    saved = {name: sys.modules.get(name) for name in names}
+    sys.modules.update(emulated)
+    try:
+        yield
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+def _load_module(name: str, path: str):
+    spec = spec_from_file_location(name, path)
+    module = module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def load_plain_module(name: str):
+    # For the modules that run on CPython as they are, nothing is
+    # emulated nor left in sys.modules
+    spec = spec_from_file_location(name, join(MCC_LIB, f"{name}.py"))
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class HostRuntime():
+    def __init__(self, game_path: str | None=None):
+        with emulated_modules():
+            self._modules = {
+                name: _load_module(name, join(MCC_LIB, f"{name}.py"))
+                for name in LIB_MODULES
+            }
+            self.game = game_path and _load_module("game", game_path)
+
+    def __getitem__(self, name: str) -> ModuleType:
+        return self._modules[name]
+
+    @property
+    def playduino(self):
+        return self["playduino"]
+
+    def new_engine(self, *args: Any):
+        engine_cls = self.playduino.GameEngine
+        if self.game:
+            engine_cls = engine_cls._get_implementation(self.game)
+        reporter = HostReporter()
+        return engine_cls(reporter, *args), reporter
+
+    @staticmethod
+    def step(engine):
+        engine._loop._advance()
+        engine._tick()
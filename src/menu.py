@@ -4,6 +4,10 @@ from .path import MCC_COMPILED
 from .path import MCC_STRIPPED
 from .server import PORT
 from .server import run_server
+from .server import CODES_DEST
+from .server import REPLAY_FILENAME
+from .replay import SessionReplay
+from .replay import ReplayDivergenceError
 from .settings import Settings
 from .settings import MCCSettings
 from .settings import MissingSettings
@@ -259,6 +263,43 @@ class CompileInterface(Menu):
                 LOGGER.info(msg)
                 handle_process(Popen(f"mpremote {cmd} :", stderr=PIPE))
 
+class ReplaySession(Menu):
+    title = "Reproduzir sessão gravada"
+
+    @classmethod
+    def execute(cls):
+        project_id = input("Entre com o ID do projeto: ")
+        project_path = join(CODES_DEST, project_id)
+        try:
+            with open(join(project_path, REPLAY_FILENAME)) as f:
+                replay = SessionReplay(join(project_path, "game.py"), f.read())
+        except FileNotFoundError:
+            raise ExecutionError(
+                "Não há sessão gravada para esse projeto"
+            )
+        try:
+            result = replay.run()
+        except ReplayDivergenceError as e:
+            raise ExecutionError(str(e))
+        LOGGER.info(
+            f"{result.frames} frames reproduzidos, "
+            f"{result.checked} pontos de verificação até o frame "
+            f"{result.checked_frames}"
+        )
+        if not result.is_fully_checked:
+            LOGGER.warning(
+                f"Os frames {result.checked_frames + 1} a "
+                f"{result.recorded_frames} não foram verificados"
+            )
+        if result.is_truncated:
+            LOGGER.warning(
+                "O registro de entradas encheu, a sessão só pôde ser "
+                f"reproduzida até o frame {result.frames} "
+                f"de {result.recorded_frames}"
+            )
+        if result.errors:
+            LOGGER.error(result.errors)
+
 class ChangeSettings(Menu):
     title = "Configurações"
 
@@ -293,4 +334,4 @@ class ChangeSettings(Menu):
         cls.submenus = list(yield_submenus())
 
 class MainMenu(Menu):
-    submenus = [RunServer, CompileInterface, ChangeSettings]
\ No newline at end of file
+    submenus = [RunServer, CompileInterface, ReplaySession, ChangeSettings]
\ No newline at end of file
@@ -0,0 +1,138 @@
+from .host import HostRuntime
+from struct import unpack_from
+from struct import calcsize
+from binascii import a2b_base64
+from collections import defaultdict
+
+class ReplayDivergenceError(Exception):
+    def __init__(self, first: int, frame: int, expected: int, found: int):
+        super().__init__()
+        # Checkpoints chain every frame, the divergence is somewhere
+        # after the last one that matched
+        self.first = first
+        self.frame = frame
+        self.expected = expected
+        self.found = found
+
+    def __str__(self):
+        return (
+            f"Replay diverged between frames {self.first} and {self.frame} "
+            f"(hash {self.found:04x}, expected {self.expected:04x})"
+        )
+
+class SessionLog():
+    def __init__(
+        self,
+        seed: int,
+        frames: int,
+        complete_frames: int,
+        inputs: dict[int, list[tuple[int, int]]],
+        hashes: dict[int, int]
+    ):
+        self.seed = seed
+        self.frames = frames
+        # Inputs after this frame didn't fit in the device's log
+        self.complete_frames = complete_frames
+        self.inputs = inputs
+        self.hashes = hashes
+
+    @classmethod
+    def parse(cls, runtime: HostRuntime, encoded: str | bytes):
+        recorder = runtime.playduino.SessionRecorder
+        data = a2b_base64(encoded)
+        (
+            magic,
+            seed,
+            frames,
+            complete_frames,
+            hash_period,
+            last_hashed,
+            inputs_len,
+            n_hashes
+        ) = unpack_from(recorder._HEADER, data)
+        if magic != recorder._MAGIC:
+            raise ValueError("Invalid session log")
+        offset = calcsize(recorder._HEADER)
+        inputs = defaultdict[int, list[tuple[int, int]]](list)
+        for i in range(offset, offset + inputs_len, recorder._INPUT_SIZE):
+            frame, player, state = unpack_from(recorder._INPUT, data, i)
+            inputs[frame].append((player, state))
+        offset += inputs_len
+        hashes = {
+            (i + 1) * hash_period:
+                unpack_from(recorder._HASH, data, offset + i * 2)[0]
+            for i in range(n_hashes)
+        }
+        if last_hashed:
+            hashes[last_hashed] = unpack_from(
+                recorder._HASH,
+                data,
+                offset + n_hashes * 2
+            )[0]
+        return cls(seed, frames, complete_frames, inputs, hashes)
+
+class ReplayResult():
+    def __init__(
+        self,
+        frames: int,
+        recorded_frames: int,
+        checked: int,
+        checked_frames: int,
+        errors: str
+    ):
+        self.frames = frames
+        self.recorded_frames = recorded_frames
+        self.checked = checked
+        # Frames up to this one matched the device, the rest weren't checked
+        self.checked_frames = checked_frames
+        self.errors = errors
+
+    @property
+    def is_truncated(self):
+        return self.frames < self.recorded_frames
+
+    @property
+    def is_fully_checked(self):
+        return self.checked_frames >= self.recorded_frames
+
+class SessionReplay():
+    def __init__(self, game_path: str, encoded: str | bytes):
+        self._runtime = HostRuntime(game_path)
+        self._log = SessionLog.parse(self._runtime, encoded)
+
+    def run(self):
+        log = self._log
+        engine, reporter = self._runtime.new_engine(log.seed)
+        playduino = self._runtime.playduino
+        gamepads = playduino.GP_BUILDER._gamepads
+        chain_hash = playduino.SessionRecorder._chain_hash
+        last_checkpoint = max(log.hashes, default=0)
+        chain = 0
+        checked = 0
+        checked_frames = 0
+        for frame in range(1, log.complete_frames + 1):
+            for player, state in log.inputs.get(frame, ()):
+                gamepads[player]._push_state(state)
+            self._runtime.step(engine)
+            if frame > last_checkpoint:
+                continue
+            chain = chain_hash(chain, engine._get_state_hash())
+            expected = log.hashes.get(frame)
+            if expected is None:
+                continue
+            if chain != expected:
+                raise ReplayDivergenceError(
+                    checked_frames + 1,
+                    frame,
+                    expected,
+                    chain
+                )
+            checked += 1
+            checked_frames = frame
+        return ReplayResult(
+            log.complete_frames,
+            log.frames,
+            checked,
+            checked_frames,
+            reporter.format_errors()
+        )
@@ -1,6 +1,8 @@
 from .settings import ServerSettings
 from .compiler import MPYCompiler
 from .ip import LOCAL_IP
+from .flight import FlightTimeline
+from .sprites import SpriteBaker
 from httpx import AsyncClient
 from httpx import HTTPError
 from contextlib import asynccontextmanager
@@ -31,7 +33,6 @@ from logging import getLogger
 from typing import Callable
 import uvicorn
 import aiofiles
-import aiofiles.os
 
 
 
@@ -51,6 +52,41 @@ PROJECT_ERROR_REPORT = """🚨 **Ocorreu um erro durante a execução do seu pro
 📜 **Traceback do erro:**
 {}
 """
+PROJECT_FLIGHT_REPORT = """🛩️ Linha do tempo antes do erro
+🔖 ID do projeto: {}
+{}
+"""
+PROJECT_RECORDING_REPORT = """🎞️ Sessão gravada para reprodução
+🔖 ID do projeto: {}
+{}
+"""
+RECORDING_LINE = "• Gravação: {} frames verificados com {} pontos de verificação"
+RECORDING_GAP_LINE = "• Gravação: {} frames verificados com {} pontos de verificação ⚠️ frames {} a {} sem verificação, o registro de entradas encheu"
+PROJECT_PROFILE_REPORT = """📊 **Relatório de desempenho do seu projeto**
+🔖 ID do projeto: `{}`
+⏱️ Frame médio: {:.1f} ms ({} frames)
+{}
+"""
+PROFILE_HOOK_LINE = "• `{}.{}`: média de {:.1f} ms, {:.0f}% do frame, {} chamadas"
+PROFILE_MAX_LINES = 10
+TIMERS_LINE = "• Agendador: {} timers ativos (pico {}), {:.2f} disparos e {:.2f} verificações por frame"
+PROJECT_LATENCY_REPORT = """🎮 **Latência dos controles até os LEDs**
+🔖 ID do projeto: `{}`
+{}
+"""
+LATENCY_LINE = "• Latência de `{}`: {} entradas, média {:.0f} ms, máxima {} ms · {}"
+LATENCY_BUCKET = "{}-{} ms: {}"
+LATENCY_LAST_BUCKET = "{}+ ms: {}"
+LATENCY_DROPPED_LINE = "• Latência: {} entradas descartadas com a fila cheia"
+IDLE_LINE = "• Atualização adaptativa: {} de {} frames pulados sem mudanças ({:.0f}%)"
+OUTPUT_LINE = "• Saída: {} frames limitados pelo orçamento de corrente, brilho em {}/255, ~{} mA no último frame"
+PROJECT_POOLS_REPORT = """🧱 **Memória reservada pelo seu projeto**
+🔖 ID do projeto: `{}`
+{}
+"""
+GRID_FOOTPRINT_LINE = "• Grade: {} células alocadas ({} visíveis), {:+.1f} KB de saldo frente às {} células com borda ({:.1f} KB em buffers)"
+POOL_LINE = "• `{}`: {} objetos (capacidade {}), {:.1f} KB"
+POOL_GROWN_LINE = "• `{}`: {} objetos (capacidade {}), {:.1f} KB ⚠️ cresceu {} vezes após o primeiro frame"
 MISSING_COMMAND_ARGUMENT = "⚠️ Esse comando requer os seguintes argumentos: {}"
 PROJECT_COMPILE_ERROR = "❌ Ocorreu um erro ao pre compilar seu projeto:\n{} "
 PROJECT_FILE_MISSING = "❌ Não foi encontrado esse projeto na base de dados, peça ao aluno para refazer o registro"
@@ -66,6 +102,8 @@ SETTINGS: ServerSettings = None
 
 
 CODES_DEST = "codes"
+REPLAY_FILENAME = "replay.b64"
+FLIGHT_FILENAME = "flight.json"
 LOOP: AbstractEventLoop = None
 MESSAGE_MAX_LENGTH = MessageLimit.MAX_TEXT_LENGTH - 3
 
@@ -186,6 +224,7 @@ async def receive_project_file(handler: HandlerManager[None]):
     async with aiofiles.open(code_path, "w", newline="") as f:
         await f.write(code_content)
     await run_in_executor(MPYCompiler.strip_code, code_path, code_path)
+    await run_in_executor(SpriteBaker.bake_file, code_path, code_path)
     try:
         await run_in_executor(
             MPYCompiler.compile_code,
@@ -195,7 +234,6 @@ async def receive_project_file(handler: HandlerManager[None]):
     except SubprocessError as e:
         text = PROJECT_COMPILE_ERROR.format(str(e))
         return await handler.send_message(text)
-    await aiofiles.os.remove(code_path)
     async with aiofiles.open(f"{tmp_path}/metadata.json", "w") as f:
         await f.write(metadata.model_dump_json())
     await handler.send_message(
@@ -287,21 +325,73 @@ async def lifespan(_):
     
 app = FastAPI(lifespan=lifespan, title="Playduino")
 
+class FlightReport(BaseModel):
+    data: str
+    block_classes: list[str]
+    players: list[str]
+
+    def timeline(self):
+        return FlightTimeline.from_base64(
+            self.data,
+            self.block_classes,
+            self.players
+        )
+
+class RecordingStats(BaseModel):
+    frames: int
+    replayable: int
+    checked: int
+    checkpoints: int
+
+    def format(self):
+        if self.checked >= self.frames:
+            return RECORDING_LINE.format(self.checked, self.checkpoints)
+        return RECORDING_GAP_LINE.format(
+            self.checked,
+            self.checkpoints,
+            self.checked + 1,
+            self.frames
+        )
+
 class ErrorReport(BaseModel):
     error_trace: str
+    replay: str | None = None
+    recording: RecordingStats | None = None
+    flight: FlightReport | None = None
 
-@app.post("/project/report/{project_id}")
-async def report_error(project_id: str, report: ErrorReport):
+async def load_metadata(project_id: str):
     metadata_path = f"{CODES_DEST}/{project_id}/metadata.json"
     try:
         async with aiofiles.open(metadata_path) as f:
             data = await f.read()
-            metadata = ProjectMetadata.model_validate_json(data)
+            return ProjectMetadata.model_validate_json(data)
     except FileNotFoundError:
-        return LOGGER.debug(
+        LOGGER.debug(
             f"Project ID {project_id} not "
             "found, skipping report..."
         )
+
+async def save_replay(
+    project_id: str,
+    replay: str | None,
+    recording: RecordingStats | None
+):
+    if replay:
+        path = f"{CODES_DEST}/{project_id}/{REPLAY_FILENAME}"
+        async with aiofiles.open(path, "w") as f:
+            await f.write(replay)
+    if recording:
+        await send_message(
+            SETTINGS.teacher_user_id,
+            PROJECT_RECORDING_REPORT.format(project_id, recording.format())
+        )
+
+@app.post("/project/report/{project_id}")
+async def report_error(project_id: str, report: ErrorReport):
+    metadata = await load_metadata(project_id)
+    if not metadata:
+        return
+    await save_replay(project_id, report.replay, report.recording)
     await send_message(
         metadata.user_id,
         PROJECT_ERROR_REPORT.format(
@@ -310,6 +400,209 @@ async def report_error(project_id: str, report: ErrorReport):
         ), 
         parse_mode="Markdown"
     )
+    if report.flight:
+        await report_flight(project_id, report.flight)
+
+async def report_flight(project_id: str, flight: FlightReport):
+    path = f"{CODES_DEST}/{project_id}/{FLIGHT_FILENAME}"
+    async with aiofiles.open(path, "w") as f:
+        await f.write(flight.model_dump_json())
+    await send_message(
+        SETTINGS.teacher_user_id,
+        PROJECT_FLIGHT_REPORT.format(
+            project_id,
+            flight.timeline().format()
+        )
+    )
+
+class HookProfile(BaseModel):
+    hook: str
+    owner: str
+    calls: int
+    total_us: int
+    max_us: int
+
+class ProfileReport(BaseModel):
+    frames: int
+    frame_us: int
+    hooks: list[HookProfile]
+
+    def format(self):
+        frame_us = self.frame_us or 1
+        hooks = sorted(self.hooks, key=lambda h: h.total_us, reverse=True)
+        return "\n".join(
+            PROFILE_HOOK_LINE.format(
+                hook.owner,
+                hook.hook,
+                hook.total_us / hook.calls / 1000,
+                hook.total_us / frame_us * 100,
+                hook.calls
+            )
+            for hook in hooks[:PROFILE_MAX_LINES]
+        )
+
+class PoolFootprint(BaseModel):
+    name: str
+    capacity: int
+    size: int
+    grown: int
+    bytes: int
+
+    def format(self):
+        line = POOL_GROWN_LINE if self.grown else POOL_LINE
+        return line.format(
+            self.name,
+            self.size,
+            self.capacity,
+            self.bytes / 1024,
+            self.grown
+        )
+
+class GridFootprint(BaseModel):
+    slots: int
+    visible: int
+    bordered: int
+    buffer_bytes: int
+    saved_bytes: int
+
+    def format(self):
+        return GRID_FOOTPRINT_LINE.format(
+            self.slots,
+            self.visible,
+            self.saved_bytes / 1024,
+            self.bordered,
+            self.buffer_bytes / 1024
+        )
+
+class TimerStats(BaseModel):
+    slots: int
+    timers: int
+    peak: int
+    busiest: int
+    ticks: int
+    fired: int
+    visited: int
+
+    def format(self):
+        ticks = self.ticks or 1
+        return TIMERS_LINE.format(
+            self.timers,
+            self.peak,
+            self.fired / ticks,
+            self.visited / ticks
+        )
+
+class OutputStats(BaseModel):
+    limit: int
+    limited: int
+    current_ma: int
+
+    def format(self):
+        return OUTPUT_LINE.format(self.limited, self.limit, self.current_ma)
+
+class PlayerLatency(BaseModel):
+    label: str
+    counts: list[int]
+    total_ms: int
+    max_ms: int
+
+    def format_histogram(self, bucket_ms: int):
+        last = len(self.counts) - 1
+        return ", ".join(
+            LATENCY_LAST_BUCKET.format(i * bucket_ms, count)
+            if i == last else
+            LATENCY_BUCKET.format(i * bucket_ms, (i + 1) * bucket_ms - 1, count)
+            for i, count in enumerate(self.counts)
+            if count
+        )
+
+    def format(self, bucket_ms: int):
+        n_inputs = sum(self.counts)
+        return LATENCY_LINE.format(
+            self.label,
+            n_inputs,
+            self.total_ms / (n_inputs or 1),
+            self.max_ms,
+            self.format_histogram(bucket_ms)
+        )
+
+class LatencyStats(BaseModel):
+    bucket_ms: int
+    dropped: int
+    players: list[PlayerLatency]
+
+    def format(self):
+        lines = [
+            player.format(self.bucket_ms)
+            for player in self.players
+            if any(player.counts)
+        ]
+        if self.dropped:
+            lines.append(LATENCY_DROPPED_LINE.format(self.dropped))
+        return "\n".join(lines)
+
+class IdleStats(BaseModel):
+    frames: int
+    skipped: int
+
+    def format(self):
+        return IDLE_LINE.format(
+            self.skipped,
+            self.frames,
+            self.skipped / (self.frames or 1) * 100
+        )
+
+class SessionReport(BaseModel):
+    profile: ProfileReport | None = None
+    timers: TimerStats | None = None
+    output: OutputStats | None = None
+    idle: IdleStats | None = None
+    latency: LatencyStats | None = None
+    replay: str | None = None
+    recording: RecordingStats | None = None
+    pools: list[PoolFootprint] | None = None
+    grid: GridFootprint | None = None
+
+@app.post("/project/session/{project_id}")
+async def report_session(project_id: str, report: SessionReport):
+    metadata = await load_metadata(project_id)
+    if not metadata:
+        return
+    await save_replay(project_id, report.replay, report.recording)
+    profile = report.profile
+    if profile and profile.frames:
+        lines = profile.format()
+        if report.timers:
+            lines += "\n" + report.timers.format()
+        if report.output:
+            lines += "\n" + report.output.format()
+        if report.idle:
+            lines += "\n" + report.idle.format()
+        await send_message(
+            metadata.user_id,
+            PROJECT_PROFILE_REPORT.format(
+                project_id,
+                profile.frame_us / profile.frames / 1000,
+                profile.frames,
+                lines
+            ),
+            parse_mode="Markdown"
+        )
+    if report.pools:
+        lines = [pool.format() for pool in report.pools]
+        if report.grid:
+            lines.append(report.grid.format())
+        await send_message(
+            metadata.user_id,
+            PROJECT_POOLS_REPORT.format(project_id, "\n".join(lines)),
+            parse_mode="Markdown"
+        )
+    if report.latency:
+        await send_message(
+            metadata.user_id,
+            PROJECT_LATENCY_REPORT.format(project_id, report.latency.format()),
+            parse_mode="Markdown"
+        )
 
 class HandshakeData(BaseModel):
     mcc_url: str
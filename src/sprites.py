@@ -0,0 +1,207 @@
+from .host import load_plain_module
+from argparse import ArgumentParser
+from functools import cache
+from typing import Any
+import ast
+
+BLOCK_BASE = "GameBlock"
+BLOCK_DEFAULTS = {"frames": None, "shape": None, "cell_colors": {}}
+ASCII_CELLS = ".#@%*+=oxABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+class UnresolvedValue(Exception): ...
+
+@cache
+def _display():
+    return load_plain_module("display")
+
+class SpriteBaker():
+    # Game code is never executed on the host, values are
+    # resolved from literals and module level constants only
+    def __init__(self, tree: ast.Module):
+        self._classes: dict[str, ast.ClassDef] = {}
+        self._constants: dict[str, ast.expr] = {}
+        self._imported: dict[str, str] = {}
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                self._classes[node.name] = node
+            elif (
+                isinstance(node, ast.Assign) and
+                len(node.targets) == 1 and
+                isinstance(node.targets[0], ast.Name)
+            ):
+                self._constants[node.targets[0].id] = node.value
+            elif (
+                isinstance(node, ast.ImportFrom) and
+                node.module == "playduino"
+            ):
+                for alias in node.names:
+                    self._imported[alias.asname or alias.name] = alias.name
+
+    def _eval(self, node: ast.expr, depth: int=0) -> Any:
+        if depth > 32:
+            raise UnresolvedValue()
+        depth += 1
+        match node:
+            case ast.Constant(value=value):
+                return value
+            case ast.List(elts=elts) | ast.Tuple(elts=elts):
+                return [self._eval(elt, depth) for elt in elts]
+            case ast.Dict(keys=keys, values=values) if None not in keys:
+                return {
+                    self._freeze(self._eval(key, depth)):
+                    self._freeze(self._eval(value, depth))
+                    for key, value in zip(keys, values)
+                }
+            case ast.Name(id=name) if name in self._constants:
+                return self._eval(self._constants[name], depth)
+            case ast.Attribute(value=ast.Name(id=name), attr=attr) if (
+                self._imported.get(name) == "PixelColors"
+            ):
+                value = getattr(_display().PixelColors, attr, None)
+                if value is None:
+                    raise UnresolvedValue()
+                return value
+        raise UnresolvedValue()
+
+    @classmethod
+    def _freeze(cls, value: Any):
+        if isinstance(value, list):
+            return tuple(cls._freeze(item) for item in value)
+        return value
+
+    def _is_block(self, name: str, seen: frozenset[str]=frozenset()):
+        if name in seen or name not in self._classes:
+            return False
+        return any(
+            isinstance(base, ast.Name) and (
+                self._imported.get(base.id) == BLOCK_BASE or
+                self._is_block(base.id, seen | {name})
+            )
+            for base in self._classes[name].bases
+        )
+
+    def _lookup(self, name: str, attr: str) -> Any:
+        for node in self._classes[name].body:
+            if isinstance(node, ast.Assign):
+                targets = node.targets
+            elif isinstance(node, ast.AnnAssign) and node.value:
+                targets = [node.target]
+            else:
+                continue
+            if any(
+                isinstance(target, ast.Name) and target.id == attr
+                for target in targets
+            ):
+                return self._eval(node.value)
+        base = self._classes[name].bases[0]
+        if not isinstance(base, ast.Name):
+            raise UnresolvedValue()
+        if self._imported.get(base.id) == BLOCK_BASE:
+            return BLOCK_DEFAULTS[attr]
+        if base.id not in self._classes:
+            raise UnresolvedValue()
+        return self._lookup(base.id, attr)
+
+    def _bake(self, name: str):
+        frames = self._lookup(name, "frames") or [self._lookup(name, "shape")]
+        if frames == [None]:
+            raise UnresolvedValue()
+        return _display().parse_frames(
+            frames,
+            self._lookup(name, "cell_colors")
+        )
+
+    def tables(self):
+        for name in self._classes:
+            if not self._is_block(name):
+                continue
+            try:
+                yield name, self._bake(name)
+            except (UnresolvedValue, TypeError, _display().FrameError):
+                # Left for the device, which raises the proper error
+                continue
+
+    @classmethod
+    def bake_code(cls, code: str):
+        try:
+            baker = cls(ast.parse(code))
+        except SyntaxError:
+            return code
+        lines = [
+            f"{name}._baked = {baked!r}"
+            for name, baked in baker.tables()
+        ]
+        if not lines:
+            return code
+        return code.rstrip("\n") + "\n" + "\n".join(lines) + "\n"
+
+    @classmethod
+    def bake_file(cls, src: str, dest: str):
+        with open(src) as f:
+            code = f.read()
+        with open(dest, "w", newline="") as f:
+            f.write(cls.bake_code(code))
+
+def _format_color(color: tuple[int, ...]):
+    return "({}, {}, {})".format(*color[:3])
+
+def png_to_frames(path: str, frame_width: int):
+    # Pillow is only needed on the developer's machine
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError(
+            "Pillow is required to convert PNG sprite sheets"
+        )
+    with Image.open(path) as image:
+        image = image.convert("RGBA")
+        width, height = image.size
+        pixels = image.load()
+    if frame_width <= 0 or width % frame_width:
+        raise ValueError(
+            f"Image width {width} isn't a multiple of {frame_width}"
+        )
+    symbols: dict[tuple[int, ...], str] = {}
+    frames: list[list[str]] = []
+    for start in range(0, width, frame_width):
+        rows = []
+        for y in range(height):
+            row = ""
+            for x in range(start, start + frame_width):
+                r, g, b, a = pixels[x, y]
+                if not a or not (r or g or b):
+                    row += "."
+                    continue
+                color = r, g, b
+                if color not in symbols:
+                    if len(symbols) + 1 >= len(ASCII_CELLS):
+                        raise ValueError("Too many colors in sprite sheet")
+                    symbols[color] = ASCII_CELLS[len(symbols) + 1]
+                row += symbols[color]
+            rows.append(row)
+        frames.append(rows)
+    return frames, {symbol: color for color, symbol in symbols.items()}
+
+def format_frames(frames: list[list[str]], cell_colors: dict[str, tuple]):
+    lines = ["frames = ["]
+    for frame in frames:
+        lines.append("    [")
+        lines.extend(f"        {row!r}," for row in frame)
+        lines.append("    ],")
+    lines.append("]")
+    lines.append("cell_colors = {")
+    lines.extend(
+        f"    {symbol!r}: {_format_color(color)},"
+        for symbol, color in cell_colors.items()
+    )
+    lines.append("}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Converte uma sprite sheet PNG em quadros de um bloco"
+    )
+    parser.add_argument("path")
+    parser.add_argument("--frame-width", type=int, required=True)
+    args = parser.parse_args()
+    print(format_frames(*png_to_frames(args.path, args.frame_width)))